@@ -1,5 +1,7 @@
 import numpy as np
 from digicampipe.io.containers import CameraEventType
+from digicampipe.utils.precision import as_float, get_float_dtype
+from digicampipe.utils.ring_buffer import RollingStatistics
 
 __all__ = ['fill_dark_baseline', 'fill_baseline', 'fill_digicam_baseline',
            'compute_baseline_with_min', 'subtract_baseline',
@@ -8,12 +10,14 @@ __all__ = ['fill_dark_baseline', 'fill_baseline', 'fill_digicam_baseline',
 
 
 def fill_dark_baseline(events, dark_baseline):
+    dark_baseline = as_float(dark_baseline)
     for event in events:
         event.data.dark_baseline = dark_baseline
         yield event
 
 
 def fill_baseline(events, baseline):
+    baseline = as_float(baseline)
     for event in events:
         event.data.baseline = baseline
         yield event
@@ -21,7 +25,7 @@ def fill_baseline(events, baseline):
 
 def fill_digicam_baseline(events):
     for event in events:
-        event.data.baseline = event.data.digicam_baseline
+        event.data.baseline = as_float(event.data.digicam_baseline)
         yield event
 
 
@@ -35,14 +39,19 @@ def correct_wrong_baseline(events):
 def compute_baseline_with_min(events):
     for event in events:
         adc_samples = event.data.adc_samples
-        event.data.baseline = np.min(adc_samples, axis=-1)
+        event.data.baseline = as_float(np.min(adc_samples, axis=-1))
         yield event
 
 
 def subtract_baseline(events):
+    """
+    Convert the adc samples to floats, with the precision given by
+    digicampipe.utils.precision, and subtract the baseline.
+    """
+    dtype = get_float_dtype()
     for event in events:
         baseline = event.data.baseline
-        event.data.adc_samples = event.data.adc_samples.astype(baseline.dtype)
+        event.data.adc_samples = event.data.adc_samples.astype(dtype)
         event.data.adc_samples -= baseline[..., np.newaxis]
         yield event
 
@@ -55,17 +64,19 @@ def compute_baseline_shift(events):
 
 
 def compute_baseline_std(events, n_events):
-    baselines_std = []
+    baselines_std = None
     for event in events:
 
         data = event.data.adc_samples
 
         if event.event_type.INTERNAL in event.event_type:
+            if baselines_std is None:
+                baselines_std = RollingStatistics(n_events,
+                                                  shape=data.shape[:1])
             baselines_std.append(data.std(axis=1))
-            baselines_std = baselines_std[-n_events:]
-            event.data.baseline_std = np.mean(baselines_std, axis=0)
+            event.data.baseline_std = baselines_std.mean()
 
-        if len(baselines_std) == n_events:
+        if baselines_std is not None and baselines_std.is_full():
             yield event
 
 
@@ -76,7 +87,7 @@ def compute_nsb_rate(events, gain, pulse_area, crosstalk, bias_resistance,
         nsb_rate = _compute_nsb_rate(baseline_shift, gain, pulse_area,
                                      crosstalk, bias_resistance,
                                      cell_capacitance)
-        event.data.nsb_rate = nsb_rate
+        event.data.nsb_rate = as_float(nsb_rate)
         yield event
 
 
@@ -153,26 +164,26 @@ def _pde_drop_from_baseline_shift(baseline_shift,
 
 
 def fill_baseline_r0(event_stream, n_bins=10000):
-    n_events = None
-    baselines = []
-    baselines_std = []
+    baselines = None
+    baselines_std = None
     for event in event_stream:
         for telescope_id in event.r0.tels_with_data:
             r0_camera = event.r0.tel[telescope_id]
             adc_samples = r0_camera.adc_samples
-            if n_events is None:
+            if baselines is None:
                 n_events = n_bins // adc_samples.shape[1]
+                n_pixels = adc_samples.shape[0]
+                baselines = RollingStatistics(n_events, shape=(n_pixels, ))
+                baselines_std = RollingStatistics(n_events,
+                                                  shape=(n_pixels, ))
 
             if CameraEventType.INTERNAL in r0_camera.camera_event_type:
-
                 baselines.append(adc_samples.mean(axis=1))
-                baselines = baselines[-n_events:]
                 baselines_std.append(adc_samples.std(axis=1))
-                baselines_std = baselines_std[-n_events:]
 
-            if len(baselines) == n_events:
-                r0_camera.baseline = np.mean(baselines, axis=0)
-                r0_camera.standard_deviation = np.mean(baselines_std, axis=0)
+            if baselines.is_full():
+                r0_camera.baseline = baselines.mean()
+                r0_camera.standard_deviation = baselines_std.mean()
         yield event
 
 
@@ -186,7 +197,7 @@ def compute_baseline_from_waveform(events, bin_left=5, bin_right=10):
     which baseline is computed
     :return:
     """
-
+    dtype = get_float_dtype()
     for event in events:
         adc_samples = event.data.adc_samples
 
@@ -195,8 +206,8 @@ def compute_baseline_from_waveform(events, bin_left=5, bin_right=10):
         adc_samples = np.concatenate((adc_samples_first,
                                       adc_samples_last), axis=1)
 
-        baseline = np.mean(adc_samples, axis=-1)
-        std = np.std(adc_samples, axis=-1)
+        baseline = np.mean(adc_samples, axis=-1, dtype=dtype)
+        std = np.std(adc_samples, axis=-1, dtype=dtype)
 
         event.data.baseline = baseline
         event.data.baseline_std = std
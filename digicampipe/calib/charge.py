@@ -7,6 +7,7 @@ from pkg_resources import resource_filename
 from probfit import Chi2Regression
 from scipy.ndimage.filters import convolve1d
 
+from digicampipe.utils.precision import as_float, get_float_dtype
 from digicampipe.utils.pulse_template import NormalizedPulseTemplate
 
 TEMPLATE_FILENAME = resource_filename(
@@ -29,18 +30,18 @@ def compute_charge(events, integral_width, shift):
     :param shift: shift to the pulse index
     :return:
     """
-
+    dtype = get_float_dtype()
     for count, event in enumerate(events):
         adc_samples = event.data.adc_samples
         pulse_mask = event.data.pulse_mask
 
         convolved_signal = convolve1d(
             adc_samples,
-            np.ones(integral_width),
+            np.ones(integral_width, dtype=dtype),
             axis=-1
         )
 
-        charges = np.zeros(convolved_signal.shape) * np.nan
+        charges = np.full(convolved_signal.shape, np.nan, dtype=dtype)
         charges[pulse_mask] = convolved_signal[
             np.roll(pulse_mask, shift, axis=1)
         ]
@@ -198,7 +199,7 @@ def compute_number_of_pe_from_interpolator(events, charge_to_pe_function,
     for event in events:
 
         charge = event.data.reconstructed_charge
-        pe = charge_to_pe_function(charge)
+        pe = as_float(charge_to_pe_function(charge))
         event.data.reconstructed_number_of_pe = pe
 
         if debug:
@@ -209,12 +210,12 @@ def compute_number_of_pe_from_interpolator(events, charge_to_pe_function,
 
 
 def compute_amplitude(events):
-
+    dtype = get_float_dtype()
     for count, event in enumerate(events):
         adc_samples = event.data.adc_samples
         pulse_indices = event.data.pulse_mask
 
-        charges = np.ones(adc_samples.shape) * np.nan
+        charges = np.full(adc_samples.shape, np.nan, dtype=dtype)
         charges[pulse_indices] = adc_samples[pulse_indices]
         event.data.reconstructed_amplitude = charges
 
@@ -295,7 +296,7 @@ def compute_photo_electron(events, gains):
         charge = event.data.reconstructed_charge
 
         gain_drop = event.data.gain_drop
-        corrected_gains = gains * gain_drop
+        corrected_gains = as_float(gains * gain_drop)
         pe = charge / corrected_gains
         event.data.reconstructed_number_of_pe = pe
 
@@ -314,7 +315,7 @@ def compute_sample_photo_electron(events, gain_amplitude):
     for count, event in enumerate(events):
         adc_samples = event.data.adc_samples
         gain_drop = event.data.gain_drop[:, None]
-        sample_pe = adc_samples / (gain_amplitude[:, None] * gain_drop)
+        sample_pe = adc_samples / as_float(gain_amplitude[:, None] * gain_drop)
         event.data.sample_pe = sample_pe
         yield event
 
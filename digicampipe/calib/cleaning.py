@@ -2,6 +2,8 @@ import numpy as np
 from astropy import units as u
 from ctapipe.image import cleaning
 
+from digicampipe.utils.precision import as_float
+
 
 def compute_cleaning_1(events, snr=3, overwrite=True):
     for event in events:
@@ -93,11 +95,11 @@ def compute_dilate(events, geom):
 def compute_3d_cleaning(events, geom, threshold_sample_pe=20,
                         threshold_time=2.1 * u.ns, threshold_size=0.005 * u.mm,
                         n_sample=50, sampling_time=4 * u.ns):
-    samples = np.arange(
+    samples = as_float(np.arange(
         0, n_sample * sampling_time.value, sampling_time.value
-    ) * sampling_time.unit
-    pix_x = geom.pix_x[:, None]
-    pix_y = geom.pix_y[:, None]
+    )) * sampling_time.unit
+    pix_x = as_float(geom.pix_x[:, None])
+    pix_y = as_float(geom.pix_y[:, None])
     pix_t = samples[None, :]
     for event in events:
         sample_pe = event.data.sample_pe
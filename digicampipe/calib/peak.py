@@ -8,6 +8,7 @@ from scipy.signal import correlate
 from scipy.signal import find_peaks_cwt
 from tqdm import tqdm
 
+from digicampipe.utils.precision import as_float
 from digicampipe.utils.pulse_template import NormalizedPulseTemplate
 
 TEMPLATE_FILENAME = resource_filename(
@@ -89,6 +90,7 @@ def find_pulse_correlate(events, threshold,
     template[template < 0.1] = 0
     template = np.tile(template, (1296, 1))
     template = template / np.sum(template, axis=-1)[..., np.newaxis]
+    template = as_float(template)
 
     for count, event in enumerate(events):
         adc_samples = event.data.adc_samples
@@ -1,24 +1,27 @@
 import numpy as np
 
-__all__ = ['tag_burst_from_moving_average_baseline']
+from digicampipe.utils.ring_buffer import RollingStatistics
+
+__all__ = ['tag_burst_from_moving_average_baseline',
+           'moving_average_baseline', 'tag_burst_from_baselines']
+
+# the moving average of the baseline is reset after gaps longer than that
+BURST_GAP_NS = 30 * 1e9
 
 
 def tag_burst_from_moving_average_baseline(events, n_previous_events=100,
                                            threshold_lsb=5):
-    last_mean_baselines = []
+    last_mean_baselines = RollingStatistics(n_previous_events)
     last_time = None
     for event in events:
         mean_baseline = np.mean(event.data.baseline)
         time = event.data.local_time
         # reset buffer if there is a gap > 30s
-        if last_time is not None and time - last_time > 30:
-            last_mean_baselines = []
-        if len(last_mean_baselines) != n_previous_events:
-            last_mean_baselines.append(mean_baseline)
-        else:
-            last_mean_baselines = last_mean_baselines[1:]
-            last_mean_baselines.append(mean_baseline)
-        moving_avg_baseline = np.mean(last_mean_baselines)
+        if last_time is not None and time - last_time > BURST_GAP_NS:
+            last_mean_baselines.clear()
+        last_time = time
+        last_mean_baselines.append(mean_baseline)
+        moving_avg_baseline = last_mean_baselines.mean()
         if (mean_baseline - moving_avg_baseline) > threshold_lsb:
             event.data.burst = True
         else:
@@ -26,6 +29,53 @@ def tag_burst_from_moving_average_baseline(events, n_previous_events=100,
         yield event
 
 
+def moving_average_baseline(timestamps, baselines, n_previous_events=100):
+    """
+    Moving average of the baseline of a whole run, as computed event by
+    event in tag_burst_from_moving_average_baseline(), using cumulative
+    sums.
+    :param timestamps: time of each event in ns
+    :param baselines: baseline of each event (averaged over the camera)
+    :param n_previous_events: number of events (including the current one)
+    in the moving average. The average is restarted after gaps of more than
+    30 s between events.
+    :return: moving average of the baseline for each event
+    """
+    timestamps = np.asarray(timestamps)
+    baselines = np.asarray(baselines, dtype=np.float64)
+    n_events = len(baselines)
+    event_index = np.arange(n_events)
+    # index of the first event after the last gap
+    is_after_gap = np.zeros(n_events, dtype=bool)
+    is_after_gap[0:1] = True
+    is_after_gap[1:] = np.diff(timestamps) > BURST_GAP_NS
+    gap_index = np.maximum.accumulate(np.where(is_after_gap, event_index, 0))
+    window_start = np.maximum(event_index + 1 - n_previous_events, gap_index)
+    cumulative_sum = np.zeros(n_events + 1)
+    np.cumsum(baselines, out=cumulative_sum[1:])
+    window_sum = cumulative_sum[event_index + 1] - cumulative_sum[window_start]
+    return window_sum / (event_index + 1 - window_start)
+
+
+def tag_burst_from_baselines(timestamps, baselines, n_previous_events=100,
+                             threshold_lsb=5):
+    """
+    Same as tag_burst_from_moving_average_baseline() for a whole run at
+    once.
+    :param timestamps: time of each event in ns
+    :param baselines: baseline of each event (averaged over the camera)
+    :param n_previous_events: number of events in the moving average of the
+    baseline (c.f. moving_average_baseline())
+    :param threshold_lsb: an event is part of a burst if its baseline is
+    more than threshold_lsb above the moving average.
+    :return: boolean array, True for the events in a burst
+    """
+    moving_average = moving_average_baseline(
+        timestamps, baselines, n_previous_events=n_previous_events
+    )
+    return (np.asarray(baselines) - moving_average) > threshold_lsb
+
+
 def tag_border_events(events, geom, skip=False):
     for event in events:
         mask = event.data.cleaning_mask
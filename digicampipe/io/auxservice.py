@@ -1,19 +1,65 @@
+import hashlib
+import os
+import pickle
 from collections import OrderedDict, namedtuple
-from datetime import timedelta
+from datetime import date as datetime_date, timedelta
 from functools import lru_cache
 from glob import glob
 from os import path
 from warnings import warn
 
 import numpy as np
-import pandas as pd
 from astropy import table
 
+NS_PER_DAY = 24 * 3600 * 10 ** 9
+# the aux files of a date contain the night starting at noon of that date
+DAY_OFFSET_NS = 12 * 3600 * 10 ** 9
+# directory where the merged tables of each day are kept between runs.
+# Set the environment variable DIGICAMPIPE_AUX_CACHE to change it, or to
+# "none" to disable the disk cache.
+AUX_CACHE_DIR = os.environ.get(
+    'DIGICAMPIPE_AUX_CACHE',
+    path.join(path.expanduser('~'), '.cache', 'digicampipe', 'aux')
+)
+if AUX_CACHE_DIR.lower() == 'none':
+    AUX_CACHE_DIR = None
+
+
+def get_day(timestamp_in_ns):
+    ''' number of the aux files date (since 1970-01-01) of a timestamp,
+    works on arrays.
+    '''
+    return (np.asarray(timestamp_in_ns, dtype=np.int64) - DAY_OFFSET_NS) \
+        // NS_PER_DAY
+
 
 class AuxService:
-    def __init__(self, name, basepath):
+    def __init__(self, name, basepath, cache_dir=AUX_CACHE_DIR,
+                 columns=None, derived=None):
+        ''' name: name of the service, f.e. 'DriveSystem'
+        basepath: directory of the aux files
+        cache_dir: directory where the merged tables of each day are cached
+            (c.f. load_combined_table()). If None, no disk cache is used.
+        columns: list of the columns needed. Only those (and "timestamp")
+            are kept in the tables and in the rows returned by at().
+            If None, all the columns are kept.
+        derived: dictionary of the quantities derived from the columns.
+            The keys are the names of the quantities, the values are
+            functions taking the dictionary of the columns of a whole day
+            (as numpy arrays) and returning the quantity for each row.
+            They are computed once per day and are part of the rows
+            returned by at() and at_many().
+        '''
         self.name = name
         self.basepath = basepath
+        self.cache_dir = cache_dir
+        self.column_names = None
+        if columns is not None:
+            self.column_names = ['timestamp']
+            for column in columns:
+                if column not in self.column_names:
+                    self.column_names.append(column)
+        self.derived = OrderedDict() if derived is None else derived
         self.glob_expr_fits = path.join(
             basepath,
             '{name}_{{date}}*.fits'.format(
@@ -27,6 +73,15 @@ class AuxService:
             )
         )
         self.namedtuple_klass = None
+        # columns of the currently loaded day, as numpy arrays
+        self.day = None
+        self.columns = None
+        # range of timestamps in ns (included, excluded) of the loaded day
+        self.day_range = (np.inf, -np.inf)
+        # last row returned by at() and the range of timestamps in ms
+        # (excluded, included) for which it is the current row
+        self.row = None
+        self.row_range = (np.inf, -np.inf)
 
     def get_paths(self, date):
         fits_files = glob(
@@ -42,19 +97,18 @@ class AuxService:
         fits_files.extend(fits_gz_files)
         return sorted(fits_files)
 
-    # maxsize needs to be > number of Services
-    # lru cache for instance methods is shit...
-    @lru_cache(maxsize=20)
     def at_date(self, date):
         ''' fetch fits Table for named aux service at date.
         If several files: append them in order.
-        takes some time, result will maybe be cached.
+        The result is cached in memory and on disk,
+        c.f. load_combined_table().
         '''
         paths = self.get_paths(date)
         if len(paths) == 0:
             raise RuntimeError("no data found for " + self.name + " on " +
                                str(date))
-        combined_table = combine_tables(paths)
+        combined_table = load_combined_table(paths, cache_dir=self.cache_dir,
+                                             columns=self.column_names)
 
         # side effect!
         # we've just read a new day, so we update the format of our
@@ -65,42 +119,163 @@ class AuxService:
         )
         return combined_table
 
-    def at(self, event_timestamp_in_ns):
-        datetime = pd.to_datetime(event_timestamp_in_ns, unit='ns')
-        date = (datetime - timedelta(hours=12)).date()
+    def load_day(self, day):
+        ''' make the table of the day (as returned by get_day()) the current
+        one, with its columns converted to numpy arrays once.
+        '''
+        if day == self.day:
+            return
+        date = datetime_date(1970, 1, 1) + timedelta(days=int(day))
         table = self.at_date(date)
+        self.columns = OrderedDict(
+            (name, np.asarray(table[name])) for name in table.colnames
+        )
+        derived_columns = OrderedDict(
+            (name, np.asarray(function(self.columns)))
+            for name, function in self.derived.items()
+        )
+        self.columns.update(derived_columns)
+        self.namedtuple_klass = namedtuple(self.name + "Row",
+                                           list(self.columns.keys()))
+        self.day = day
+        day_start = int(day) * NS_PER_DAY + DAY_OFFSET_NS
+        self.day_range = (day_start, day_start + NS_PER_DAY)
+        self.row = None
+        self.row_range = (np.inf, -np.inf)
 
+    def at(self, event_timestamp_in_ns):
+        ''' row of the table valid at the time of an event, i.e. the last
+        row with a timestamp before the event.
+        As consecutive events mostly fall between the same 2 rows, the
+        returned row is kept and returned again until an event falls outside
+        of its range. That check only compares python numbers, as it is done
+        for every event.
+        '''
+        event_timestamp_in_ns = int(event_timestamp_in_ns)
         event_timestamp_in_ms = event_timestamp_in_ns / 1e6
-        table_index = np.searchsorted(
-            table['timestamp'],
-            event_timestamp_in_ms
-        )
-        # this row is still a astropy.Table.Row thing
-        row = table[table_index - 1]
-        return self.namedtuple_klass(**{
-            name: row[name]
-            for name in table.colnames
+        row_start, row_end = self.row_range
+        day_start, day_end = self.day_range
+        if row_start < event_timestamp_in_ms <= row_end and \
+                day_start <= event_timestamp_in_ns < day_end:
+            return self.row
+        self.load_day(get_day(event_timestamp_in_ns))
+        timestamps = self.columns['timestamp']
+        table_index = np.searchsorted(timestamps, event_timestamp_in_ms)
+        self.row = self.namedtuple_klass(**{
+            name: column[table_index - 1]
+            for name, column in self.columns.items()
         })
+        self.row_range = (
+            float(timestamps[table_index - 1]) if table_index > 0
+            else -np.inf,
+            float(timestamps[table_index]) if table_index < len(timestamps)
+            else np.inf
+        )
+        return self.row
 
+    def at_many(self, timestamps_in_ns):
+        ''' same as at() for an array of timestamps, with one searchsorted
+        per day of data.
+        returns a namedtuple of arrays, the element i of each array being
+        the value at timestamps_in_ns[i].
+        '''
+        timestamps_in_ns = np.asarray(timestamps_in_ns, dtype=np.int64)
+        days = get_day(timestamps_in_ns)
+        result = None
+        for day in np.unique(days):
+            in_day = days == day
+            self.load_day(day)
+            table_indices = np.searchsorted(
+                self.columns['timestamp'],
+                timestamps_in_ns[in_day] / 1e6
+            )
+            if result is None:
+                result = OrderedDict(
+                    (name, np.zeros(
+                        (len(timestamps_in_ns), ) + column.shape[1:],
+                        dtype=column.dtype
+                    ))
+                    for name, column in self.columns.items()
+                )
+            for name, column in self.columns.items():
+                result[name][in_day] = column[table_indices - 1]
+        if result is None:
+            raise ValueError('at_many() needs at least one timestamp')
+        return self.namedtuple_klass(**result)
 
-def read_table(path):
+
+def read_table(path, columns=None):
     ''' basically astropy.table.Table.read(path), but
     we need a "timestamp" column to syncronize with event times.
     In some files "timestamp" is called "TIMESTAMP" so we rename them.
+    If columns is not None, only these columns are kept.
     '''
     t = table.Table.read(path)
     if 'TIMESTAMP' in t.colnames:
         t.rename_column('TIMESTAMP', 'timestamp')
+    if columns is not None:
+        missing_columns = [name for name in columns if name not in t.colnames]
+        if len(missing_columns) > 0:
+            raise KeyError('columns {} not found in {}'.format(
+                missing_columns, path))
+        t = t[list(columns)]
     return t
 
 
-def combine_tables(paths):
+def load_combined_table(paths, cache_dir=AUX_CACHE_DIR, columns=None):
+    ''' combine_tables(paths, columns) with 2 levels of cache, both keyed by
+    the columns and the paths with their modification time and size, such
+    that a modified file is read again:
+    - in memory, shared by all AuxService instances and bounded to the 20
+    last tables (maxsize needs to be > number of Services).
+    - on disk in cache_dir, as pickle files, shared between runs.
+    If cache_dir is None, only the memory cache is used.
+    The returned table is shared, it must not be modified.
+    '''
+    key = tuple(
+        (path.abspath(p), os.stat(p).st_mtime, os.stat(p).st_size)
+        for p in paths
+    )
+    if columns is not None:
+        columns = tuple(columns)
+    return _load_combined_table(key, cache_dir, columns)
+
+
+@lru_cache(maxsize=20)
+def _load_combined_table(key, cache_dir, columns):
+    if cache_dir is None:
+        return combine_tables([p for p, _, _ in key], columns=columns)
+    digest = hashlib.sha1(repr((key, columns)).encode()).hexdigest()
+    name = path.basename(key[0][0]).split('.')[0]
+    cache_file = path.join(cache_dir, '{}_{}.pickle'.format(name, digest))
+    if path.isfile(cache_file):
+        try:
+            with open(cache_file, 'rb') as file:
+                return pickle.load(file)
+        except Exception as exception:
+            warn('could not read aux cache ' + cache_file + ': ' +
+                 str(exception))
+    combined_table = combine_tables([p for p, _, _ in key], columns=columns)
+    temporary_file = cache_file + '.tmp{}'.format(os.getpid())
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temporary_file, 'wb') as file:
+            pickle.dump(combined_table, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_file, cache_file)
+    except OSError as exception:
+        warn('could not write aux cache ' + cache_file + ': ' +
+             str(exception))
+    return combined_table
+
+
+def combine_tables(paths, columns=None):
     ''' merge astropy.table.Tables read from paths
+    If columns is not None, only these columns are read (c.f. read_table())
 
     the meta information from the tables is merged in a complex way, c.f.
     combine_table_metas
     '''
-    tables = [read_table(path) for path in paths]
+    tables = [read_table(path, columns=columns) for path in paths]
     merged_table = table.vstack(tables, metadata_conflicts='silent')
     merged_table.meta = combine_table_metas(tables)
     return merged_table
@@ -165,3 +340,83 @@ def combine_table_metas(tables):
                 warn(k + ' has ' + str(len(v)) + ' data points instead of 1')
             result[k] = v.pop()
     return result
+
+
+# slow data columns used to fill the output of digicam-pipeline
+# (c.f. SLOW_DATA_DERIVED)
+SLOW_DATA_COLUMNS = {
+    'DriveSystem': [
+        'current_position_az', 'current_position_el', 'is_on_source',
+        'is_tracking',
+    ],
+    'DigicamSlowControl': ['Crate1_T', 'Crate2_T', 'Crate3_T'],
+    'MasterSST1M': ['target_radec'],
+    'SafetyPLC': ['SPLC_CAM_Status'],
+    'PDPSlowControl': [
+        'Sector1_T', 'Sector2_T', 'Sector3_T',
+        'Sector1_HV', 'Sector2_HV', 'Sector3_HV',
+        'Sector1_GHV', 'Sector2_GHV', 'Sector3_GHV',
+    ],
+}
+
+
+def _stack_columns(columns, names):
+    # (n_rows, n_values) array of the values of all the columns for each row
+    return np.concatenate(
+        [np.reshape(columns[name], (len(columns[name]), -1))
+         for name in names],
+        axis=1
+    )
+
+
+def _mean_valid_temperature(columns, names):
+    # temperatures outside of ]0, 60[ are wrong readings
+    temperature = _stack_columns(columns, names)
+    valid = np.logical_and(temperature > 0, temperature < 60)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.sum(np.where(valid, temperature, 0), axis=1) / \
+            np.sum(valid, axis=1)
+
+
+def _all_on(columns, names):
+    return np.all(_stack_columns(columns, names).astype(bool), axis=1)
+
+
+def _status_bit(columns, name, bit):
+    return (np.asarray(columns[name]) & 1 << bit).astype(bool)
+
+
+# fields of the output of digicam-pipeline for each slow data service, as
+# functions of the columns of a day (c.f. AuxService). As slow data are
+# updated much less often than events, they are computed once for each row of
+# the table.
+SLOW_DATA_DERIVED = {
+    'DriveSystem': OrderedDict([
+        ('az', lambda c: c['current_position_az']),
+        ('el', lambda c: c['current_position_el']),
+        ('is_on_source', lambda c: c['is_on_source'].astype(bool)),
+        ('is_tracking', lambda c: c['is_tracking'].astype(bool)),
+    ]),
+    'DigicamSlowControl': OrderedDict([
+        ('digicam_temperature', lambda c: _mean_valid_temperature(
+            c, ['Crate1_T', 'Crate2_T', 'Crate3_T'])),
+    ]),
+    'MasterSST1M': OrderedDict([
+        ('target_ra', lambda c: c['target_radec'][:, 0]),
+        ('target_dec', lambda c: c['target_radec'][:, 1]),
+    ]),
+    'SafetyPLC': OrderedDict([
+        # bit 8 of status_LEDs is about on/off, bit 9 about blinking
+        ('pointing_leds_on', lambda c: _status_bit(c, 'SPLC_CAM_Status', 8)),
+        ('pointing_leds_blink',
+         lambda c: _status_bit(c, 'SPLC_CAM_Status', 9)),
+    ]),
+    'PDPSlowControl': OrderedDict([
+        ('pdp_temperature', lambda c: _mean_valid_temperature(
+            c, ['Sector1_T', 'Sector2_T', 'Sector3_T'])),
+        ('all_hv_on', lambda c: _all_on(
+            c, ['Sector1_HV', 'Sector2_HV', 'Sector3_HV'])),
+        ('all_ghv_on', lambda c: _all_on(
+            c, ['Sector1_GHV', 'Sector2_GHV', 'Sector3_GHV'])),
+    ]),
+}
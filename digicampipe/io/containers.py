@@ -8,6 +8,7 @@ Please keep in mind that the data level definition and the associated fields
 might change rapidly as there is no final data level definition.
 """
 from aenum import IntFlag
+from functools import partial
 import pickle
 from gzip import open as gzip_open
 from os import remove
@@ -28,6 +29,7 @@ __all__ = ['CameraEventType',
            'InstrumentContainer',
            'R0Container',
            'R0CameraContainer',
+           'R0BatchContainer',
            'R1Container',
            'R1CameraContainer',
            'DL0Container',
@@ -60,6 +62,29 @@ class CameraEventType(IntFlag):
     HILLAS = 0x20000  # camera server computed Hillas parametrs
 
 
+def _make_lazy(container_class, field_name):
+    """
+    Make the Field `field_name` of a Container class lazy: if it holds a
+    deferred computation (a functools.partial), it is evaluated on first
+    access and replaced by its result. As items() and as_dict() access the
+    Fields by name, they return the evaluated value too.
+    """
+    # slot holding the value of the Field in the Container instances
+    slot = getattr(container_class, field_name)
+
+    def getter(self):
+        value = slot.__get__(self, container_class)
+        if isinstance(value, partial):
+            value = value()
+            slot.__set__(self, value)
+        return value
+
+    def setter(self, value):
+        slot.__set__(self, value)
+
+    setattr(container_class, field_name, property(getter, setter))
+
+
 class InstrumentContainer(Container):
     """Storage of header info that does not change with event. This is a
     temporary hack until the Instrument module and database is fully
@@ -194,6 +219,12 @@ class R0CameraContainer(Container):
     num_samples = Field(int, "number of time samples for telescope")
 
 
+# the trigger traces are decoded only when accessed
+for _field_name in ['trigger_input_traces', 'trigger_output_patch7',
+                    'trigger_output_patch19']:
+    _make_lazy(R0CameraContainer, _field_name)
+
+
 class R0Container(Container):
     """
     Storage of a Merged Raw Data Event
@@ -205,6 +236,23 @@ class R0Container(Container):
     tel = Field(Map(R0CameraContainer), "map of tel_id to R0CameraContainer")
 
 
+class R0BatchContainer(Container):
+    """
+    Storage of a block of consecutive raw events from a single telescope.
+    The first dimension of every array is the index of the event in the block.
+    """
+    tel_id = Field(int, 'telescope id')
+    event_id = Field(ndarray, 'event counter in the file (n_events, )')
+    camera_event_number = Field(ndarray, 'camera event number (n_events, )')
+    local_camera_clock = Field(ndarray, 'camera timestamp (n_events, )')
+    gps_time = Field(ndarray, 'gps timestamp (n_events, )')
+    camera_event_type = Field(ndarray, 'camera event type (n_events, )')
+    array_event_type = Field(ndarray, 'array event type (n_events, )')
+    adc_samples = Field(ndarray, 'ADC samples (n_events, n_pixels, n_samples)')
+    digicam_baseline = Field(ndarray, 'Baseline computed by DigiCam '
+                                      '(n_events, n_pixels)')
+
+
 class R1CameraContainer(Container):
     """
     Storage of r1 calibrated data from a single telescope
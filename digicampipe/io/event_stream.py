@@ -4,13 +4,18 @@ from collections import namedtuple
 import numpy as np
 from tqdm import tqdm
 
-from digicampipe.io import zfits, hdf5, hessio
+from digicampipe.io import zfits, hdf5, hessio, r0cache
 from digicampipe.io.containers import CalibrationContainer
 from .auxservice import AuxService
 
+# parameters of zfits.zfits_parallel_event_source() which can be given to
+# event_stream() as kwargs when n_workers is set
+PARALLEL_KWARGS = {'camera', 'batch_size'}
+
 
 def event_stream(filelist, source=None, max_events=None, disable_bar=False,
-                 event_id_range=(None, None), **kwargs):
+                 event_id_range=(None, None), time_range=(None, None),
+                 n_workers=None, **kwargs):
     """Iterable of events in the form of `DataContainer`.
 
     Parameters
@@ -23,12 +28,28 @@ def event_stream(filelist, source=None, max_events=None, disable_bar=False,
             * digicampipe.io.zfits.zfits_event_source
             * digicampipe.io.hdf5.digicamtoy_event_source
             * digicampipe.io.hessio_digicam.hessio_event_source
+            * digicampipe.io.r0cache.r0_cache_event_source
     max_events: max_events to iterate over
     event_id_range: minimum and maximum event id to be returned. Set one of
     them to None to disable that limit.
+    time_range: minimum (included) and maximum (excluded) local camera clock
+    in ns of the events to be returned. Set one of them to None to disable
+    that limit.
+    For zfits files, the ranges are passed to the event source which uses
+    the event index of each file to skip the events outside of the ranges
+    without decoding them. The same is done for R0 caches, and for the
+    event_id_range of digicamtoy files.
     disable_bar: If set to true, the progress bar is not shown.
+    n_workers: If not None, the zfits files are decoded by n_workers
+    processes in parallel, c.f. zfits.zfits_parallel_event_source().
+    The order of the events is preserved. Only the raw data is filled
+    in this mode (no trigger traces) and the only kwargs accepted are
+    the ones in PARALLEL_KWARGS.
     kwargs: parameters for event_source
         Some event_sources need special parameters to work, c.f. their doc.
+        The zfits and digicamtoy sources accept prefetch=K to read the next
+        K events (chunks for digicamtoy) in a background thread while the
+        current one is processed.
     """
 
     # If the caller gives us a path and not a list of paths,
@@ -36,7 +57,6 @@ def event_stream(filelist, source=None, max_events=None, disable_bar=False,
     # This is not clean but convenient.
     if isinstance(filelist, (str, bytes)):
         filelist = [filelist]
-    n_files = len(filelist)
     count = 0
 
     for file in filelist:
@@ -44,9 +64,62 @@ def event_stream(filelist, source=None, max_events=None, disable_bar=False,
         if not os.path.exists(file):
             raise FileNotFoundError('File {} does not exists'.format(file))
 
+    if n_workers is None:
+
+        data_stream = _files_event_stream(
+            filelist, source=source, disable_bar=disable_bar,
+            event_id_range=event_id_range, time_range=time_range, **kwargs
+        )
+
+    else:
+
+        if source not in (None, zfits.zfits_event_source) or \
+                any(guess_source_from_path(file) is not
+                    zfits.zfits_event_source for file in filelist):
+            raise ValueError('Parallel decoding (n_workers={}) is only '
+                             'implemented for zfits files'.format(n_workers))
+        unsupported_kwargs = set(kwargs.keys()) - PARALLEL_KWARGS
+        if len(unsupported_kwargs) > 0:
+            raise ValueError(
+                'Parameters {} are not supported with parallel decoding '
+                '(n_workers={}), only {} are.'.format(
+                    sorted(unsupported_kwargs), n_workers,
+                    sorted(PARALLEL_KWARGS))
+            )
+        data_stream = zfits.zfits_parallel_event_source(
+            filelist, n_workers=n_workers, max_events=max_events,
+            disable_bar=disable_bar, event_id_range=event_id_range,
+            time_range=time_range, **kwargs
+        )
+
     if max_events is None:
         max_events = np.inf
 
+    for event in data_stream:
+        tel = event.r0.tels_with_data[0]
+        r0 = event.r0.tel[tel]
+        event_id = r0.camera_event_number
+        if event_id_range[0] and event_id <= event_id_range[0]:
+            continue
+        if event_id_range[1] and event_id > event_id_range[1]:
+            return
+        if time_range[0] is not None and \
+                r0.local_camera_clock < time_range[0]:
+            continue
+        if time_range[1] is not None and \
+                r0.local_camera_clock >= time_range[1]:
+            continue
+        if count >= max_events:
+            return
+        count += 1
+        yield event
+
+
+def _files_event_stream(filelist, source=None, disable_bar=False,
+                        event_id_range=(None, None), time_range=(None, None),
+                        **kwargs):
+    n_files = len(filelist)
+
     if n_files == 1:
 
         file_stream = filelist
@@ -58,18 +131,17 @@ def event_stream(filelist, source=None, max_events=None, disable_bar=False,
     for file in file_stream:
         if source is None:
             source = guess_source_from_path(file)
-        data_stream = source(url=file, disable_bar=disable_bar, **kwargs)
+        source_kwargs = kwargs
+        if source in (zfits.zfits_event_source,
+                      r0cache.r0_cache_event_source):
+            source_kwargs = dict(kwargs, event_id_range=event_id_range,
+                                 time_range=time_range)
+        elif source is hdf5.digicamtoy_event_source:
+            source_kwargs = dict(kwargs, event_id_range=event_id_range)
+        data_stream = source(url=file, disable_bar=disable_bar,
+                             **source_kwargs)
         try:
             for event in data_stream:
-                tel = event.r0.tels_with_data[0]
-                event_id = event.r0.tel[tel].camera_event_number
-                if event_id_range[0] and event_id <= event_id_range[0]:
-                    continue
-                if event_id_range[1] and event_id > event_id_range[1]:
-                    raise StopIteration
-                if count >= max_events:
-                    raise StopIteration
-                count += 1
                 yield event
         except EOFError as e:
             print('WARNING: unexpected end of file', file, ':', e)
@@ -81,32 +153,117 @@ def calibration_event_stream(path,
                              pixel_id=[...],
                              max_events=None,
                              event_id_range=(None, None),
+                             time_range=(None, None),
                              disable_bar=False,
                              **kwargs):
     """
     Event stream for the calibration of the camera based on the observation
     event_stream()
+    If pixel_id selects all the pixels or a contiguous range of pixels, the
+    data of the container are views on the r0 data. Otherwise the selected
+    pixels are copied into buffers reused for all events.
+    The cleaning mask is also a buffer reset to True for each event.
+    If all the inputs are R0 caches with pixel-major samples, the pixel
+    selection is done by the source, which then reads only the samples of
+    the selected pixels (c.f. r0cache.r0_cache_event_source()).
     """
     container = CalibrationContainer()
+    pixel_selection = None
+    if _select_pixels_in_source(path, pixel_id, kwargs.get('source')):
+        kwargs = dict(kwargs, pixel_id=pixel_id)
+        pixel_id = np.asarray(pixel_id)
+        if pixel_id.dtype == bool:
+            pixel_id = np.flatnonzero(pixel_id)
+        pixel_selection = slice(0, len(pixel_id))
+        container.pixel_id = pixel_id
+        cleaning_mask = np.ones(len(pixel_id), dtype=bool)
     for event in event_stream(path, max_events=max_events,
                               event_id_range=event_id_range,
+                              time_range=time_range,
                               disable_bar=disable_bar, **kwargs):
         r0_event = list(event.r0.tel.values())[0]
-        container.pixel_id = np.arange(r0_event.adc_samples.shape[0])[pixel_id]
+        if pixel_selection is None:
+            n_pixels = r0_event.adc_samples.shape[0]
+            pixel_selection, container.pixel_id = _get_pixel_selection(
+                pixel_id, n_pixels
+            )
+            n_pixels_selected = len(container.pixel_id)
+            cleaning_mask = np.ones(n_pixels_selected, dtype=bool)
+            adc_samples = None
         container.event_type = r0_event.camera_event_type
-        container.data.adc_samples = r0_event.adc_samples[pixel_id]
-        container.data.digicam_baseline = r0_event.digicam_baseline[pixel_id]
+        if isinstance(pixel_selection, slice):
+            container.data.adc_samples = \
+                r0_event.adc_samples[pixel_selection]
+            container.data.digicam_baseline = \
+                r0_event.digicam_baseline[pixel_selection]
+        else:
+            if adc_samples is None or \
+                    adc_samples.shape[1:] != r0_event.adc_samples.shape[1:]:
+                adc_samples = np.empty(
+                    (n_pixels_selected, ) + r0_event.adc_samples.shape[1:],
+                    dtype=r0_event.adc_samples.dtype
+                )
+                digicam_baseline = np.empty(
+                    n_pixels_selected,
+                    dtype=r0_event.digicam_baseline.dtype
+                )
+            container.data.adc_samples = np.take(
+                r0_event.adc_samples, pixel_selection, axis=0,
+                out=adc_samples
+            )
+            container.data.digicam_baseline = np.take(
+                r0_event.digicam_baseline, pixel_selection, axis=0,
+                out=digicam_baseline
+            )
         container.data.local_time = r0_event.local_camera_clock
         container.data.gps_time = r0_event.gps_time
-        container.data.cleaning_mask = \
-            np.ones(container.data.adc_samples.shape[0], dtype=bool)
+        cleaning_mask.fill(True)
+        container.data.cleaning_mask = cleaning_mask
         container.event_id = r0_event.camera_event_number
         container.mc = event.mc
         yield container
 
 
+def _is_all_pixels(pixel_id):
+    return pixel_id is None or pixel_id is Ellipsis or \
+        (isinstance(pixel_id, list) and pixel_id == [...])
+
+
+def _select_pixels_in_source(path, pixel_id, source=None):
+    if _is_all_pixels(pixel_id):
+        return False
+    if source not in (None, r0cache.r0_cache_event_source):
+        return False
+    if isinstance(path, (str, bytes)):
+        path = [path]
+    return all(
+        r0cache.is_r0_cache(file) and r0cache.has_pixel_major(file)
+        for file in path
+    )
+
+
+def _get_pixel_selection(pixel_id, n_pixels):
+    """
+    Get the index selecting pixel_id in arrays of n_pixels pixels.
+    :param pixel_id: list of pixel ids. [...] or None select all pixels.
+    :param n_pixels: number of pixels of the camera
+    :return: the index (a slice if the selected pixels are contiguous, an
+    array of pixel ids otherwise) and the array of the selected pixel ids.
+    """
+    all_pixels = np.arange(n_pixels)
+    if _is_all_pixels(pixel_id):
+        return slice(0, n_pixels), all_pixels
+    pixel_ids = all_pixels[pixel_id]
+    if len(pixel_ids) > 0 and np.all(np.diff(pixel_ids) == 1):
+        pixel_selection = slice(pixel_ids[0], pixel_ids[-1] + 1)
+        return pixel_selection, pixel_ids
+    return pixel_ids, pixel_ids
+
+
 def guess_source_from_path(path):
-    if path.endswith('.fits.fz'):
+    if r0cache.is_r0_cache(path):
+        return r0cache.r0_cache_event_source
+    elif path.endswith('.fits.fz'):
         return zfits.zfits_event_source
     elif path.endswith('.h5') or path.endswith('.hdf5'):
         return hdf5.digicamtoy_event_source
@@ -123,13 +280,29 @@ def add_slow_data(
             'SafetyPLC',
             'DriveSystem',
         ),
-        basepath=None
+        basepath=None,
+        columns=None,
+        derived=None,
 ):
+    # columns: dictionary of the columns needed for each service (c.f.
+    # AuxService). The services not in it keep all their columns.
+    # derived: dictionary of the quantities derived from the columns for each
+    # service (c.f. AuxService).
+    if columns is None:
+        columns = {}
+    if derived is None:
+        derived = {}
     services = {
-        name: AuxService(name, basepath)
+        name: AuxService(name, basepath, columns=columns.get(name),
+                         derived=derived.get(name))
         for name in aux_services
     }
     SlowDataContainer = namedtuple('SlowDataContainer', aux_services)
+    # The sources reuse the same container for all events, so events can not
+    # be buffered to get their slow data at once with AuxService.at_many():
+    # the buffered events would all hold the data of the last one read.
+    # Instead AuxService.at() returns the same row, after 2 comparisons, as
+    # long as the events stay between the same 2 slow data timestamps.
     for event_id, event in enumerate(data_stream):
         tel = event.r0.tels_with_data[0]
         services_event = {
@@ -149,13 +322,22 @@ def add_slow_data_calibration(
             'SafetyPLC',
             'DriveSystem',
         ),
-        basepath=None
+        basepath=None,
+        columns=None,
+        derived=None,
 ):
+    # c.f. add_slow_data() for columns and derived
+    if columns is None:
+        columns = {}
+    if derived is None:
+        derived = {}
     services = {
-        name: AuxService(name, basepath)
+        name: AuxService(name, basepath, columns=columns.get(name),
+                         derived=derived.get(name))
         for name in aux_services
     }
     SlowDataContainer = namedtuple('SlowDataContainer', aux_services)
+    # c.f. add_slow_data() for why AuxService.at_many() is not used.
     for event_id, event in enumerate(data_stream):
         services_event = {
             name: service.at(event.data.local_time)
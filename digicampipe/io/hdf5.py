@@ -1,14 +1,15 @@
 import h5py
 import numpy as np
 from tqdm import tqdm
-import warnings
 
 from digicampipe.instrument.camera import DigiCam
-from digicampipe.io.containers import DataContainer
+from digicampipe.io.containers import DataContainer, R0BatchContainer
 from digicampipe.io.containers import CameraEventType
+from digicampipe.io.prefetch import read_ahead
+from digicampipe.utils.ring_buffer import RingBuffer
 
 
-__all__ = ['digicamtoy_event_source']
+__all__ = ['digicamtoy_event_source', 'digicamtoy_batch_source']
 
 
 def digicamtoy_event_source(
@@ -17,7 +18,10 @@ def digicamtoy_event_source(
         max_events=None,
         chunk_size=150,
         event_id=None,
-        disable_bar=False
+        disable_bar=False,
+        prefetch=0,
+        event_id_range=(None, None),
+        reuse_buffers=False,
 ):
     """A generator that streams data from an HDF5 data file from DigicamToy
     Parameters
@@ -28,64 +32,179 @@ def digicamtoy_event_source(
         maximum number of events to read
     camera : utils.Camera() default: utils.DigiCam
     chunk_size : Number of events to load into the memory at once
-    event_id : TODO
+    event_id : Event id to start at. The event id of DigicamToy events is
+    their index in the file. If it is out of the range of the file it will
+    raise an IndexError.
     disable_bar: If set to true, the progress bar is not shown.
+    prefetch: number of chunks read in advance by a background thread
+    (c.f. digicampipe.io.prefetch.read_ahead()). If 0, no thread is used.
+    event_id_range: minimum (excluded) and maximum (included) event id to be
+    returned. Set one of them to None to disable that limit.
+    Only the events in the range are read from the file.
+    reuse_buffers: if True, the chunks are read with read_direct into
+    prefetch + 2 buffers allocated once. The adc_samples of an event are
+    then only valid until the events of prefetch + 1 more chunks are read.
     """
-
-    if event_id is not None:
-
-        warnings.warn('The event id search is not implemented for this'
-                      ' type of file')
-
     data = DataContainer()
-    hdf5 = h5py.File(url, 'r')
-
-    full_data_set = hdf5['data']['adc_count']
-    n_events, n_pixels, n_samples = full_data_set.shape
-
-    if 'true_baseline' in hdf5['data'].keys():
-
-        baseline = np.array(hdf5['data']['true_baseline'])
-    else:
-
-        baseline = np.zeros(n_pixels)
-
-    if max_events is None:
-        max_events = n_events
-
-    max_events = min(max_events, n_events)
-    for event_id in tqdm(range(max_events), desc='Events',
-                         disable=disable_bar):
-
-        data.r0.event_id = event_id
-        data.r0.tels_with_data = [1, ]
-
-        for tel_id in data.r0.tels_with_data:
-
-            if event_id == 0:
-                data.inst.num_channels[tel_id] = 1
-                data.inst.num_pixels[tel_id] = n_pixels
-                data.inst.geom[tel_id] = camera.geometry
-                data.inst.cluster_matrix_7[tel_id] = camera.cluster_7_matrix
-                data.inst.cluster_matrix_19[tel_id] = camera.cluster_19_matrix
-                data.inst.patch_matrix[tel_id] = camera.patch_matrix
-                data.inst.num_samples[tel_id] = n_samples
-                data.r0.tel[tel_id].digicam_baseline = baseline
-                data.r0.tel[tel_id].camera_event_type = \
-                    CameraEventType.INTERNAL
-                data.r0.tel[tel_id].array_event_type = CameraEventType.UNKNOWN
-
-            if (event_id % chunk_size) == 0:
-                index_in_chunk = 0
-                chunk_start = (event_id // chunk_size) * chunk_size
-                chunk_end = chunk_start + chunk_size
-                chunk_end = min(chunk_end, n_events)
-                adc_count = full_data_set[chunk_start:chunk_end]
-
-            data.r0.tel[tel_id].camera_event_number = event_id
-            data.r0.tel[tel_id].local_camera_clock = event_id
-            data.r0.tel[tel_id].gps_time = event_id
-            data.r0.tel[tel_id].adc_samples = adc_count[index_in_chunk]
-            index_in_chunk += 1
-
-        yield data
+    loaded_telescopes = []
+    tel_id = 1
+    data.r0.tels_with_data = [tel_id, ]
+    r0 = data.r0.tel[tel_id]
+    for batch in digicamtoy_batch_source(
+            url,
+            batch_size=chunk_size,
+            max_events=max_events,
+            event_id=event_id,
+            disable_bar=disable_bar,
+            prefetch=prefetch,
+            event_id_range=event_id_range,
+            reuse_buffers=reuse_buffers,
+    ):
+        n_events_in_batch, n_pixels, n_samples = batch.adc_samples.shape
+        if tel_id not in loaded_telescopes:
+            data.inst.num_channels[tel_id] = 1
+            data.inst.num_pixels[tel_id] = n_pixels
+            data.inst.geom[tel_id] = camera.geometry
+            data.inst.cluster_matrix_7[tel_id] = camera.cluster_7_matrix
+            data.inst.cluster_matrix_19[tel_id] = camera.cluster_19_matrix
+            data.inst.patch_matrix[tel_id] = camera.patch_matrix
+            data.inst.num_samples[tel_id] = n_samples
+            r0.digicam_baseline = np.array(batch.digicam_baseline[0])
+            r0.camera_event_type = CameraEventType.INTERNAL
+            r0.array_event_type = CameraEventType.UNKNOWN
+            loaded_telescopes.append(tel_id)
+
+        for i in range(n_events_in_batch):
+            data.r0.event_id = batch.event_id[i]
+            r0.camera_event_number = batch.camera_event_number[i]
+            r0.local_camera_clock = batch.local_camera_clock[i]
+            r0.gps_time = batch.gps_time[i]
+            r0.adc_samples = batch.adc_samples[i]
+
+            yield data
+
+
+def digicamtoy_batch_source(
+        url,
+        batch_size=150,
+        max_events=None,
+        event_id=None,
+        disable_bar=False,
+        prefetch=0,
+        event_id_range=(None, None),
+        reuse_buffers=False,
+):
+    """A generator that streams blocks of events from an HDF5 data file from
+    DigicamToy. Each block is read with a single hyperslab selection.
+    Parameters
+    ----------
+    url : str
+        path to file to open
+    batch_size : int
+        maximum number of events per block
+    max_events : int, optional
+        maximum number of events to read
+    event_id, disable_bar, prefetch, event_id_range, reuse_buffers:
+        c.f. digicamtoy_event_source()
+    Returns
+    -------
+    generator of R0BatchContainer, one per block of events.
+    The digicam_baseline is the same for all events of the file, it is a
+    read-only broadcast of the true baseline.
+    """
+    with h5py.File(url, 'r') as hdf5:
+
+        full_data_set = hdf5['data']['adc_count']
+        n_events, n_pixels, n_samples = full_data_set.shape
+
+        if 'true_baseline' in hdf5['data'].keys():
+
+            baseline = np.array(hdf5['data']['true_baseline'])
+        else:
+
+            baseline = np.zeros(n_pixels)
+
+        if event_id is not None and not 0 <= event_id < n_events:
+            raise IndexError('Cannot find event ID {} in File {}\n'
+                             'First event ID : {}\n'
+                             'Last event ID : {}'.format(event_id, url, 0,
+                                                         n_events - 1))
+        first_event, last_event = _get_event_range(
+            n_events, max_events, event_id, event_id_range
+        )
+        if first_event >= last_event:
+            return
+
+        buffers = None
+        if reuse_buffers:
+            # one buffer per chunk in the prefetch queue, plus the one being
+            # read and the one being processed
+            buffers = RingBuffer(
+                prefetch + 2,
+                shape=(min(batch_size, last_event - first_event),
+                       n_pixels, n_samples),
+                dtype=full_data_set.dtype
+            )
+        chunks = _read_chunks(full_data_set, first_event, last_event,
+                              batch_size, buffers)
+        chunks = read_ahead(chunks, prefetch)
+
+        progress_bar = tqdm(total=last_event - first_event, desc='Events',
+                            disable=disable_bar)
+        try:
+            for chunk_start, adc_count in chunks:
+                n_events_in_batch = len(adc_count)
+                event_ids = np.arange(chunk_start,
+                                      chunk_start + n_events_in_batch)
+                batch = R0BatchContainer()
+                batch.tel_id = 1
+                batch.event_id = event_ids
+                batch.camera_event_number = event_ids
+                batch.local_camera_clock = event_ids
+                batch.gps_time = event_ids
+                batch.camera_event_type = np.full(
+                    n_events_in_batch, CameraEventType.INTERNAL.value
+                )
+                batch.array_event_type = np.full(
+                    n_events_in_batch, CameraEventType.UNKNOWN.value
+                )
+                batch.adc_samples = adc_count
+                batch.digicam_baseline = np.broadcast_to(
+                    baseline, (n_events_in_batch, n_pixels)
+                )
+                yield batch
+                progress_bar.update(n_events_in_batch)
+        finally:
+            chunks.close()
+            progress_bar.close()
+
+
+def _get_event_range(n_events, max_events=None, event_id=None,
+                     event_id_range=(None, None)):
+    first_event, last_event = 0, n_events
+    if event_id is not None:
+        first_event = max(first_event, event_id)
+    if event_id_range[0] is not None:
+        first_event = max(first_event, event_id_range[0] + 1)
+    if event_id_range[1] is not None:
+        last_event = min(last_event, event_id_range[1] + 1)
+    if max_events is not None:
+        last_event = min(last_event, first_event + max_events)
+    return first_event, last_event
+
+
+def _read_chunks(data_set, first_event, last_event, chunk_size,
+                 buffers=None):
+    for chunk_start in range(first_event, last_event, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, last_event)
+        if buffers is None:
+            yield chunk_start, data_set[chunk_start:chunk_end]
+        else:
+            n_events_in_chunk = chunk_end - chunk_start
+            buffer = buffers.next_slot()
+            data_set.read_direct(
+                buffer,
+                source_sel=np.s_[chunk_start:chunk_end],
+                dest_sel=np.s_[0:n_events_in_chunk]
+            )
+            yield chunk_start, buffer[:n_events_in_chunk]
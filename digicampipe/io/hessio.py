@@ -16,6 +16,8 @@ from ctapipe.instrument import TelescopeDescription, SubarrayDescription
 
 from digicampipe.instrument.camera import DigiCam
 from digicampipe.io.containers import DataContainer
+from digicampipe.io.index import get_index, load_index
+from digicampipe.utils.precision import as_float
 
 
 logger = logging.getLogger(__name__)
@@ -33,14 +35,48 @@ except ImportError as err:
 
 __all__ = [
     'hessio_event_source',
+    'get_hessio_index',
 ]
 
+# getters of the MC fields filled by hessio_event_source, c.f. its mc_fields
+# parameter. The event fields are stored in data.mc, the header fields in
+# data.mcheader and the telescope fields in data.mc.tel[tel_id].
+MC_EVENT_FIELDS = {
+    'energy': lambda f: f.get_mc_shower_energy() * u.TeV,
+    'alt': lambda f: Angle(f.get_mc_shower_altitude(), u.rad),
+    'az': lambda f: Angle(f.get_mc_shower_azimuth(), u.rad),
+    'core_x': lambda f: f.get_mc_event_xcore() * u.m,
+    'core_y': lambda f: f.get_mc_event_ycore() * u.m,
+    'h_first_int': lambda f: f.get_mc_shower_h_first_int() * u.m,
+    'mc_event_offset_fov': lambda f: f.get_mc_event_offset_fov(),
+}
+MC_HEADER_FIELDS = {
+    'run_array_direction': lambda f: f.get_mc_run_array_direction(),
+}
+MC_TELESCOPE_FIELDS = {
+    'dc_to_pe': lambda f, tel_id: f.get_calibration(tel_id),
+    'reference_pulse_shape': lambda f, tel_id: f.get_ref_shapes(tel_id),
+    'photo_electron_image':
+        lambda f, tel_id: f.get_mc_number_photon_electron(telescope_id=tel_id),
+    'time_slice': lambda f, tel_id: f.get_time_slice(tel_id),
+    'azimuth_raw': lambda f, tel_id: f.get_azimuth_raw(tel_id),
+    'altitude_raw': lambda f, tel_id: f.get_altitude_raw(tel_id),
+    'azimuth_cor': lambda f, tel_id: f.get_azimuth_cor(tel_id),
+    'altitude_cor': lambda f, tel_id: f.get_altitude_cor(tel_id),
+}
+# stored in data.mc.tel[tel_id].meta['refstep']
+MC_TELESCOPE_META_FIELDS = {
+    'refstep': lambda f, tel_id: f.get_ref_step(tel_id),
+}
+
 
 def hessio_get_list_event_ids(url, max_events=None):
     """
     Faster method to get a list of all the event ids in the hessio file.
     This list can also be used to find out the number of events that exist
     in the file.
+    If the file was indexed (c.f. get_hessio_index()), the list is read from
+    the index.
 
     Parameters
     ----------
@@ -55,7 +91,15 @@ def hessio_get_list_event_ids(url, max_events=None):
         A list with all the event ids that are in the file.
 
     """
-    logger.warning("This method is slow. Need to find faster method.")
+    index = load_index(url)
+    if index is not None:
+        return index['event_number'][:max_events].tolist()
+    logger.warning("This method is slow. Use get_hessio_index() to only "
+                   "read the file once.")
+    return _read_event_ids(url, max_events=max_events)
+
+
+def _read_event_ids(url, max_events=None):
     try:
         with open_hessio(url) as pyhessio_file:
             Provenance().add_input_file(url, role='r0.sub.evt')
@@ -74,9 +118,27 @@ def hessio_get_list_event_ids(url, max_events=None):
                            .format(url))
 
 
+def _build_hessio_index(url):
+    event_ids = _read_event_ids(url)
+    return {'event_number': np.array(event_ids, dtype=np.int64)}
+
+
+def get_hessio_index(url):
+    """
+    Get the index of a hessio file: the array 'event_number' of the event
+    ids of the file in the order of the file.
+    The index is stored next to the data file (c.f. digicampipe.io.index)
+    so the file is read only the first time the index is needed.
+    :param url: path to the hessio file
+    :return: dictionary of 1D arrays
+    """
+    return get_index(url, _build_hessio_index)
+
+
 def hessio_event_source(url, camera=DigiCam, max_events=None,
                         allowed_tels=None, requested_event=None,
-                        use_event_id=False, event_id=None, disable_bar=False):
+                        use_event_id=False, event_id=None, disable_bar=False,
+                        mc_fields=None):
     """A generator that streams data from an EventIO/HESSIO MC data file
     (e.g. a standard CTA data file.)
 
@@ -92,17 +154,60 @@ def hessio_event_source(url, camera=DigiCam, max_events=None,
         would be 1 telescope per file (whereas in current monte-carlo,
         they are all interleaved into one file)
     requested_event : int
-        Seek to a paricular event index
+        Seek to a paricular event index. Only that event is returned.
     use_event_id : bool
         If True ,'requested_event' now seeks for a particular event id instead
         of index
+    event_id: int
+        Event id to start at. If the event ID does not exists in the file
+        it will raise an IndexError
     disable_bar : Unused, for compatibility with other readers
+    mc_fields : list[str], optional
+        MC fields to be filled (c.f. MC_EVENT_FIELDS, MC_HEADER_FIELDS,
+        MC_TELESCOPE_FIELDS and MC_TELESCOPE_META_FIELDS). If None, all
+        are filled. The pedestal is always filled as it gives the baseline.
+    For requested_event and event_id, the index of the file
+    (c.f. get_hessio_index()) is used to find the event. The events before
+    it still have to be read but are not filled, and the file is closed as
+    soon as the requested event was returned.
     """
-
+    all_mc_fields = set(MC_EVENT_FIELDS) | set(MC_HEADER_FIELDS) | \
+        set(MC_TELESCOPE_FIELDS) | set(MC_TELESCOPE_META_FIELDS)
+    if mc_fields is None:
+        mc_fields = all_mc_fields
+    mc_fields = set(mc_fields)
+    if not mc_fields <= all_mc_fields:
+        raise ValueError('Unknown MC fields: {}. Possible fields are {}'
+                         .format(sorted(mc_fields - all_mc_fields),
+                                 sorted(all_mc_fields)))
+    mc_event_getters, mc_header_getters, mc_telescope_getters, \
+        mc_telescope_meta_getters = [
+            {name: getter for name, getter in getters.items()
+             if name in mc_fields}
+            for getters in [MC_EVENT_FIELDS, MC_HEADER_FIELDS,
+                            MC_TELESCOPE_FIELDS, MC_TELESCOPE_META_FIELDS]
+        ]
+
+    first_row = 0
+    last_row = None
+    if requested_event is not None or event_id is not None:
+        event_numbers = get_hessio_index(url)['event_number']
     if event_id is not None:
-
-        raise ValueError('Event id feature not implemented yet! \n'
-                         'Use event_id=None')
+        rows = np.flatnonzero(event_numbers == event_id)
+        if len(rows) == 0:
+            raise IndexError('Cannot find event ID {} in File {}'.format(
+                event_id, url))
+        first_row = rows[0]
+    if requested_event is not None:
+        if use_event_id:
+            rows = np.flatnonzero(event_numbers == requested_event)
+        else:
+            rows = [requested_event] if \
+                0 <= requested_event < len(event_numbers) else []
+        if len(rows) == 0:
+            return
+        first_row = max(first_row, rows[0])
+        last_row = first_row + 1
 
     with open_hessio(url) as pyhessio_file:
 
@@ -121,16 +226,15 @@ def hessio_event_source(url, camera=DigiCam, max_events=None,
         data.meta['input'] = url
         data.meta['max_events'] = max_events
 
-        for event_id in tqdm(eventstream, disable=disable_bar):
+        for row, event_id in enumerate(tqdm(eventstream,
+                                            disable=disable_bar)):
 
             # Seek to requested event
-            if requested_event is not None:
-                current = counter
-                if use_event_id:
-                    current = event_id
-                if not current == requested_event:
-                    counter += 1
-                    continue
+            if row < first_row:
+                continue
+            if last_row is not None and row >= last_row:
+                pyhessio_file.close_file()
+                return
 
             data.r0.run_id = pyhessio_file.get_run_number()
             data.r0.event_id = event_id
@@ -158,19 +262,14 @@ def hessio_event_source(url, camera=DigiCam, max_events=None,
             time_s, time_ns = pyhessio_file.get_central_event_gps_time()
             data.trig.gps_time = Time(time_s * u.s, time_ns * u.ns,
                                       format='unix', scale='utc')
-            data.mc.energy = pyhessio_file.get_mc_shower_energy() * u.TeV
-            data.mc.alt = Angle(pyhessio_file.get_mc_shower_altitude(), u.rad)
-            data.mc.az = Angle(pyhessio_file.get_mc_shower_azimuth(), u.rad)
-            data.mc.core_x = pyhessio_file.get_mc_event_xcore() * u.m
-            data.mc.core_y = pyhessio_file.get_mc_event_ycore() * u.m
-            first_int = pyhessio_file.get_mc_shower_h_first_int() * u.m
-            data.mc.h_first_int = first_int
+            for name, getter in mc_event_getters.items():
+                setattr(data.mc, name, getter(pyhessio_file))
 
             # mc run header data
-            data.mcheader.run_array_direction = \
-                pyhessio_file.get_mc_run_array_direction()
+            for name, getter in mc_header_getters.items():
+                setattr(data.mcheader, name, getter(pyhessio_file))
 
-            data.count = counter
+            data.count = row
 
             # this should be done in a nicer way to not re-allocate the
             # data each time (right now it's just deleted and garbage
@@ -186,11 +285,6 @@ def hessio_event_source(url, camera=DigiCam, max_events=None,
 
             for tel_id in data.r0.tels_with_data:
 
-                data.mc.mc_event_offset_fov = \
-                    pyhessio_file.get_mc_event_offset_fov()
-
-                data.mc.tel[tel_id].dc_to_pe \
-                    = pyhessio_file.get_calibration(tel_id)
                 data.mc.tel[tel_id].pedestal \
                     = pyhessio_file.get_pedestal(tel_id)
 
@@ -210,39 +304,30 @@ def hessio_event_source(url, camera=DigiCam, max_events=None,
                 data.r0.tel[tel_id].adc_sums = \
                     pyhessio_file.get_adc_sum(tel_id)
 
-                try:
-
-                    data.mc.tel[tel_id].reference_pulse_shape = \
-                        pyhessio_file.get_ref_shapes(tel_id)
-
-                except HessioGeneralError:
-
-                    pass
-
                 nsamples = pyhessio_file.get_event_num_samples(tel_id)
                 if nsamples <= 0:
                     nsamples = 1
                 data.r0.tel[tel_id].num_samples = nsamples
 
                 # load the data per telescope/pixel
-                hessio_mc_npe = pyhessio_file.get_mc_number_photon_electron
-                data.mc.tel[tel_id].photo_electron_image \
-                    = hessio_mc_npe(telescope_id=tel_id)
-                data.mc.tel[tel_id].meta['refstep'] = \
-                    pyhessio_file.get_ref_step(tel_id)
-                data.mc.tel[tel_id].time_slice = \
-                    pyhessio_file.get_time_slice(tel_id)
-                data.mc.tel[tel_id].azimuth_raw = \
-                    pyhessio_file.get_azimuth_raw(tel_id)
-                data.mc.tel[tel_id].altitude_raw = \
-                    pyhessio_file.get_altitude_raw(tel_id)
-                data.mc.tel[tel_id].azimuth_cor = \
-                    pyhessio_file.get_azimuth_cor(tel_id)
-                data.mc.tel[tel_id].altitude_cor = \
-                    pyhessio_file.get_altitude_cor(tel_id)
+                for name, getter in mc_telescope_getters.items():
+                    try:
+                        value = getter(pyhessio_file, tel_id)
+                    except HessioGeneralError:
+                        # only files without reference pulse shape are
+                        # expected, other errors must not leave the values
+                        # of the previous event in the container
+                        if name != 'reference_pulse_shape':
+                            raise
+                        continue
+                    setattr(data.mc.tel[tel_id], name, value)
+                for name, getter in mc_telescope_meta_getters.items():
+                    data.mc.tel[tel_id].meta[name] = \
+                        getter(pyhessio_file, tel_id)
                 pedestal = data.mc.tel[tel_id].pedestal
                 baseline = pedestal / data.r0.tel[tel_id].adc_samples.shape[1]
-                data.r0.tel[tel_id].digicam_baseline = np.squeeze(baseline)
+                data.r0.tel[tel_id].digicam_baseline = \
+                    as_float(np.squeeze(baseline))
 
             yield data
             counter += 1
@@ -0,0 +1,98 @@
+"""
+Persistent per-file event index.
+The index is a set of 1D arrays (one entry per event of the data file) saved
+as a numpy .npz sidecar next to the data file. It is built once and rebuilt
+only if the data file is more recent than the index.
+"""
+import os
+import warnings
+
+import numpy as np
+
+__all__ = ['get_index_path', 'load_index', 'save_index', 'get_index',
+           'is_bounded', 'select_rows']
+
+INDEX_EXTENSION = '.index.npz'
+
+
+def get_index_path(url):
+    return url + INDEX_EXTENSION
+
+
+def load_index(url):
+    """
+    Load the index of a data file
+    :param url: path to the data file
+    :return: dictionary of the index arrays. None if the index does not
+    exist or is older than the data file.
+    """
+    index_path = get_index_path(url)
+    if not os.path.isfile(index_path):
+        return None
+    if os.path.getmtime(index_path) < os.path.getmtime(url):
+        return None
+    with np.load(index_path) as index_file:
+        index = {key: index_file[key] for key in index_file.files}
+    return index
+
+
+def save_index(url, index):
+    """
+    Save the index of a data file. If the directory of the data file is not
+    writable, a warning is issued and nothing is saved.
+    :param url: path to the data file
+    :param index: dictionary of 1D arrays
+    """
+    index_path = get_index_path(url)
+    temporary_path = index_path + '.tmp{}'.format(os.getpid())
+    try:
+        with open(temporary_path, 'wb') as file:
+            np.savez(file, **index)
+        # atomic, so that concurrent jobs never read a partial index
+        os.replace(temporary_path, index_path)
+    except OSError as e:
+        warnings.warn('Could not save the index {}: {}'.format(index_path, e))
+
+
+def get_index(url, build_index):
+    """
+    Get the index of a data file, building and saving it if needed.
+    :param url: path to the data file
+    :param build_index: function taking url as argument and returning the
+    index as a dictionary of 1D arrays
+    :return: dictionary of the index arrays
+    """
+    index = load_index(url)
+    if index is None:
+        index = build_index(url)
+        save_index(url, index)
+    return index
+
+
+def is_bounded(value_range):
+    return any(bound is not None for bound in value_range)
+
+
+def select_rows(index, event_id_range=(None, None), time_range=(None, None)):
+    """
+    Select the rows of an index within the given ranges
+    :param index: dictionary with at least the 'event_number' and
+    'local_camera_clock' arrays
+    :param event_id_range: minimum (excluded) and maximum (included) event
+    number. Set one of them to None to disable that limit.
+    :param time_range: minimum (included) and maximum (excluded) local
+    camera clock in ns. Set one of them to None to disable that limit.
+    :return: boolean array, True for the selected rows
+    """
+    event_number = index['event_number']
+    local_camera_clock = index['local_camera_clock']
+    selected = np.ones(len(event_number), dtype=bool)
+    if event_id_range[0] is not None:
+        selected &= event_number > event_id_range[0]
+    if event_id_range[1] is not None:
+        selected &= event_number <= event_id_range[1]
+    if time_range[0] is not None:
+        selected &= local_camera_clock >= time_range[0]
+    if time_range[1] is not None:
+        selected &= local_camera_clock < time_range[1]
+    return selected
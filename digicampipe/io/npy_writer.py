@@ -0,0 +1,89 @@
+"""
+Incremental writer of .npy files.
+Rows are appended to the file as they come, so arrays larger than the memory
+can be written while streaming events. The header is written with space
+reserved for the final number of rows and is updated when the file is
+closed. The resulting file is a standard .npy file, which can be read with
+np.load(filename, mmap_mode='r').
+"""
+import struct
+
+import numpy as np
+
+__all__ = ['NpyWriter']
+
+MAGIC = b'\x93NUMPY\x01\x00'  # format version 1.0
+HEADER_SIZE = 128  # total size of the header, a multiple of 64
+
+
+def _header(dtype, shape):
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': {!r}, }}"
+    header = header.format(np.lib.format.dtype_to_descr(dtype), shape)
+    header_length = HEADER_SIZE - len(MAGIC) - 2
+    if len(header) + 1 > header_length:
+        raise ValueError('shape {} is too large for the .npy header'
+                         .format(shape))
+    header = header.ljust(header_length - 1) + '\n'
+    return MAGIC + struct.pack('<H', header_length) + header.encode('latin1')
+
+
+class NpyWriter:
+    """
+    Append rows of a given shape to a .npy file.
+    The rows are buffered and written by blocks of buffer_size rows.
+    Usage:
+        with NpyWriter(filename, row_shape=(n_pixels, )) as writer:
+            for event in events:
+                writer.append(image)
+    """
+
+    def __init__(self, filename, row_shape, dtype=np.float64,
+                 buffer_size=1000):
+        """
+        :param filename: path of the .npy file to create
+        :param row_shape: shape of each row
+        :param dtype: data type of the rows
+        :param buffer_size: number of rows written to the file at once
+        """
+        self.filename = filename
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.buffer = np.zeros((buffer_size, ) + self.row_shape,
+                               dtype=self.dtype)
+        self.n_buffered = 0
+        self.n_rows = 0
+        self.file = open(filename, 'wb')
+        self.file.write(_header(self.dtype, (0, ) + self.row_shape))
+
+    def append(self, row):
+        """
+        Copy row to the buffer, writing the buffer to the file if full.
+        :param row: array of shape row_shape
+        """
+        self.buffer[self.n_buffered] = row
+        self.n_buffered += 1
+        if self.n_buffered == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer[:self.n_buffered].tobytes())
+        self.n_rows += self.n_buffered
+        self.n_buffered = 0
+        self.file.flush()
+
+    def close(self):
+        """
+        Write the remaining rows and the final header.
+        """
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.seek(0)
+        self.file.write(_header(self.dtype, (self.n_rows, ) + self.row_shape))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
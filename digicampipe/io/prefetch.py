@@ -0,0 +1,65 @@
+"""
+Read-ahead of an iterable in a background thread, such that reading and
+decompressing the next items overlaps with the processing of the current one.
+"""
+import queue
+import threading
+
+__all__ = ['read_ahead']
+
+_END = object()
+
+
+def read_ahead(iterable, depth):
+    """
+    Iterate over iterable while a background thread reads up to depth items
+    in advance.
+    The items are passed as they are from one thread to the other, so this
+    can only be used on iterables that do not modify an item once it has
+    been yielded (i.e. not on event sources reusing the same container).
+    :param iterable: the iterable to read in advance
+    :param depth: maximum number of items read in advance. If None or 0,
+    iterable is iterated without background thread.
+    :return: generator of the items of iterable, in the same order.
+    """
+    if not depth:
+        for item in iterable:
+            yield item
+        return
+
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def _put(item):
+        # give up if the consumer stopped, not to block forever
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read():
+        try:
+            for item in iterable:
+                if not _put((item, None)):
+                    return
+        except Exception as e:
+            _put((_END, e))
+            return
+        _put((_END, None))
+
+    thread = threading.Thread(target=_read, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,289 @@
+"""
+Uncompressed cache of the R0 data of a run.
+The cache is a directory (ending with R0_CACHE_EXTENSION) containing one
+.npy file per field, with one entry per event. It is written once from the
+ZFITs files of the run and read back through memory mapping, so analyses
+reading the same run many times do not decompress the ZFITs files again.
+Optionally, the cache also holds the adc samples in pixel-major order
+(n_pixels, n_events, n_samples), so that a job analysing a subset of pixels
+only reads the samples of these pixels.
+"""
+import os
+import shutil
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from tqdm import tqdm
+
+from digicampipe.instrument import camera
+from digicampipe.io.containers import DataContainer
+from digicampipe.io.index import is_bounded, select_rows
+from digicampipe.io.zfits import zfits_batch_source, count_number_events
+
+__all__ = ['R0_CACHE_EXTENSION', 'is_r0_cache', 'has_pixel_major',
+           'write_r0_cache', 'write_pixel_major', 'load_r0_cache',
+           'r0_cache_event_source']
+
+R0_CACHE_EXTENSION = '.r0cache'
+
+EVENT_FIELDS = [
+    'camera_event_number',
+    'local_camera_clock',
+    'gps_time',
+    'camera_event_type',
+    'array_event_type',
+    'adc_samples',
+    'digicam_baseline',
+]
+
+PIXEL_MAJOR_FIELD = 'adc_samples_by_pixel'
+
+
+def is_r0_cache(path):
+    return path.rstrip(os.sep).endswith(R0_CACHE_EXTENSION)
+
+
+def has_pixel_major(path):
+    return os.path.isfile(os.path.join(path, PIXEL_MAJOR_FIELD + '.npy'))
+
+
+def write_r0_cache(file_list, output, max_events=None, batch_size=1000,
+                   pixel_major=False, disable_bar=False):
+    """
+    Write the R0 data of ZFITs files to a cache directory.
+    The cache is first written to a temporary directory which is renamed
+    once complete, such that an interrupted conversion leaves no cache.
+    :param file_list: list of paths to the ZFITs files of the run
+    :param output: path of the cache directory. It must end with
+    R0_CACHE_EXTENSION and not exist.
+    :param max_events: maximum number of events to write.
+    If None, all events are written.
+    :param batch_size: number of events decoded at once
+    :param pixel_major: if True, the adc samples are also written in
+    pixel-major order (c.f. write_pixel_major())
+    :param disable_bar: If set to true, the progress bar is not shown.
+    """
+    if isinstance(file_list, str):
+        file_list = [file_list]
+    if not is_r0_cache(output):
+        raise ValueError('The R0 cache {} must end with {}'.format(
+            output, R0_CACHE_EXTENSION))
+    if os.path.exists(output):
+        raise FileExistsError('The R0 cache {} already exists'.format(output))
+    n_events = count_number_events(file_list)
+    if max_events is not None:
+        n_events = min(n_events, max_events)
+    temporary_output = output.rstrip(os.sep) + '.tmp{}'.format(os.getpid())
+    os.makedirs(temporary_output)
+    try:
+        cache = None
+        row = 0
+        bar = tqdm(total=n_events, desc='Caching', disable=disable_bar)
+        for url in file_list:
+            if row >= n_events:
+                break
+            for batch in zfits_batch_source(url, batch_size=batch_size,
+                                            max_events=n_events - row,
+                                            disable_bar=True):
+                n_events_in_batch = len(batch.event_id)
+                if cache is None:
+                    cache = _create_cache(temporary_output, batch, n_events)
+                rows = slice(row, row + n_events_in_batch)
+                for field in EVENT_FIELDS:
+                    cache[field][rows] = getattr(batch, field)
+                row += n_events_in_batch
+                bar.update(n_events_in_batch)
+        bar.close()
+        if cache is None:
+            raise ValueError('No event found in {}'.format(file_list))
+        for field in EVENT_FIELDS:
+            cache[field].flush()
+        del cache
+        if pixel_major:
+            write_pixel_major(temporary_output, batch_size=batch_size,
+                              disable_bar=disable_bar)
+        os.rename(temporary_output, output)
+    except BaseException:
+        shutil.rmtree(temporary_output, ignore_errors=True)
+        raise
+
+
+def _create_cache(path, batch, n_events):
+    np.save(os.path.join(path, 'tel_id.npy'), np.array(batch.tel_id))
+    cache = {}
+    for field in EVENT_FIELDS:
+        value = getattr(batch, field)
+        cache[field] = open_memmap(
+            os.path.join(path, field + '.npy'),
+            mode='w+',
+            dtype=value.dtype,
+            shape=(n_events, ) + value.shape[1:],
+        )
+    return cache
+
+
+def write_pixel_major(url, batch_size=1000, disable_bar=False):
+    """
+    Add the adc samples in pixel-major order, i.e. an array of shape
+    (n_pixels, n_events, n_samples), to an R0 cache.
+    :param url: path to the cache directory
+    :param batch_size: number of events transposed at once
+    :param disable_bar: If set to true, the progress bar is not shown.
+    """
+    adc_samples = np.load(os.path.join(url, 'adc_samples.npy'),
+                          mmap_mode='r')
+    n_events, n_pixels, n_samples = adc_samples.shape
+    path = os.path.join(url, PIXEL_MAJOR_FIELD + '.npy')
+    temporary_path = path + '.tmp{}'.format(os.getpid())
+    adc_samples_by_pixel = open_memmap(
+        temporary_path,
+        mode='w+',
+        dtype=adc_samples.dtype,
+        shape=(n_pixels, n_events, n_samples),
+    )
+    # read whole events, such that the event-major file is read only once
+    for start in tqdm(range(0, n_events, batch_size), desc='Transposing',
+                      disable=disable_bar):
+        end = min(start + batch_size, n_events)
+        adc_samples_by_pixel[:, start:end] = \
+            np.swapaxes(adc_samples[start:end], 0, 1)
+    adc_samples_by_pixel.flush()
+    del adc_samples_by_pixel
+    os.replace(temporary_path, path)
+
+
+def load_r0_cache(url):
+    """
+    Load an R0 cache written by write_r0_cache().
+    :param url: path to the cache directory
+    :return: dictionary of the memory mapped arrays of the cache (including
+    the telescope id 'tel_id'). They are mapped copy-on-write: they can be
+    modified in memory but the cache on disk is never modified.
+    """
+    cache = {
+        field: np.load(os.path.join(url, field + '.npy'), mmap_mode='c')
+        for field in EVENT_FIELDS
+    }
+    cache['tel_id'] = int(np.load(os.path.join(url, 'tel_id.npy')))
+    if has_pixel_major(url):
+        cache[PIXEL_MAJOR_FIELD] = np.load(
+            os.path.join(url, PIXEL_MAJOR_FIELD + '.npy'), mmap_mode='c'
+        )
+    return cache
+
+
+def r0_cache_event_source(
+        url,
+        camera=camera.DigiCam,
+        max_events=None,
+        event_id=None,
+        disable_bar=False,
+        event_id_range=(None, None),
+        time_range=(None, None),
+        pixel_id=None,
+):
+    """A generator that streams data from an R0 cache
+    (c.f. write_r0_cache()).
+    Parameters
+    ----------
+    url : str
+        path to the cache directory
+    camera : digicampipe.instrument.Camera(), default DigiCam
+    max_events : int, optional
+        maximum number of events to read
+    event_id: int
+        Event id to start at. If the exact event ID does not exists
+        it will return the closest past event. If the event ID is out of the
+        range of the file it will raise an IndexError
+    disable_bar: If set to true, the progress bar is not shown.
+    event_id_range: minimum (excluded) and maximum (included) camera event
+    number to be returned. Set one of them to None to disable that limit.
+    time_range: minimum (included) and maximum (excluded) local camera clock
+    in ns of the events to be returned. Set one of them to None to disable
+    that limit.
+    pixel_id: list of the pixels to read. If None, all pixels are read.
+    Otherwise the r0 data only contains the selected pixels, in the given
+    order. If the cache has the pixel-major samples (c.f.
+    write_pixel_major()), only the samples of these pixels are read from
+    disk.
+    The adc samples and baselines are views on the memory mapped cache.
+    """
+    cache = load_r0_cache(url)
+    event_numbers = cache['camera_event_number']
+    n_events = len(event_numbers)
+    rows = np.arange(n_events)
+
+    if event_id is not None:
+        if not event_numbers[0] <= event_id <= event_numbers[-1]:
+            raise IndexError('Cannot find event ID {} in File {}\n'
+                             'First event ID : {}\n'
+                             'Last event ID : {}'.format(event_id, url,
+                                                         event_numbers[0],
+                                                         event_numbers[-1]))
+        first_row = np.searchsorted(event_numbers, event_id, side='right') - 1
+        rows = rows[max(first_row, 0):]
+
+    if is_bounded(event_id_range) or is_bounded(time_range):
+        index = {
+            'event_number': event_numbers,
+            'local_camera_clock': cache['local_camera_clock'],
+        }
+        selected_rows = select_rows(index, event_id_range, time_range)
+        rows = rows[selected_rows[rows]]
+
+    if max_events is not None:
+        rows = rows[:max_events]
+
+    n_pixels, n_samples = cache['adc_samples'].shape[1:]
+    pixel_ids = None
+    if pixel_id is not None:
+        pixel_ids = np.arange(n_pixels)[pixel_id]
+        if np.array_equal(pixel_ids, np.arange(n_pixels)):
+            pixel_ids = None
+        else:
+            n_pixels = len(pixel_ids)
+    read_by_pixel = pixel_ids is not None and PIXEL_MAJOR_FIELD in cache
+
+    data = DataContainer()
+    tel_id = cache['tel_id']
+    data.r0.tels_with_data = [tel_id, ]
+    data.inst.num_channels[tel_id] = 1
+    data.inst.geom[tel_id] = camera.geometry
+    data.inst.cluster_matrix_7[tel_id] = camera.cluster_7_matrix
+    data.inst.cluster_matrix_19[tel_id] = camera.cluster_19_matrix
+    data.inst.patch_matrix[tel_id] = camera.patch_matrix
+    data.inst.num_pixels[tel_id] = n_pixels
+    data.inst.num_samples[tel_id] = n_samples
+    r0 = data.r0.tel[tel_id]
+
+    n_rows_in_block = 1000
+    progress_bar = tqdm(total=len(rows), desc='Events', leave=True,
+                        disable=disable_bar)
+    for block_start in range(0, len(rows), n_rows_in_block):
+        block_rows = rows[block_start:block_start + n_rows_in_block]
+        if read_by_pixel:
+            # (n_pixels, n_rows, n_samples), read pixel after pixel
+            adc_samples_block = cache[PIXEL_MAJOR_FIELD][
+                np.ix_(pixel_ids, block_rows)
+            ]
+        for i, row in enumerate(block_rows):
+            data.r0.event_id = row
+            r0.camera_event_number = cache['camera_event_number'][row]
+            r0.local_camera_clock = cache['local_camera_clock'][row]
+            r0.gps_time = cache['gps_time'][row]
+            r0.camera_event_type = cache['camera_event_type'][row]
+            r0.array_event_type = cache['array_event_type'][row]
+            if read_by_pixel:
+                r0.adc_samples = adc_samples_block[:, i]
+            elif pixel_ids is not None:
+                r0.adc_samples = cache['adc_samples'][row, pixel_ids]
+            else:
+                r0.adc_samples = cache['adc_samples'][row]
+            if pixel_ids is not None:
+                r0.digicam_baseline = \
+                    cache['digicam_baseline'][row, pixel_ids]
+            else:
+                r0.digicam_baseline = cache['digicam_baseline'][row]
+            progress_bar.update(1)
+            yield data
+    progress_bar.close()
@@ -0,0 +1,160 @@
+"""
+Zero-suppressed storage of camera images.
+Only the non-zero pixels of each image are stored, in compressed sparse row
+(CSR) layout, in an HDF5 file with the datasets:
+    event_id : (n_events, ) event id of each image
+    indptr : (n_events + 1, ) the pixels of image i are the entries
+        indptr[i] to indptr[i + 1] of pixel_id and value
+    pixel_id : (n_entries, ) pixel id of the non-zero pixels
+    value : (n_entries, ) value of the non-zero pixels
+The number of pixels of the camera is stored in the n_pixels attribute.
+"""
+import h5py
+import numpy as np
+
+__all__ = ['SparseImageWriter', 'SparseImages', 'sparse_to_dense']
+
+
+class SparseImageWriter:
+    """
+    Append images to a zero-suppressed HDF5 file, c.f. the module
+    documentation for the format.
+    Usage:
+        with SparseImageWriter(filename, n_pixels=1296) as writer:
+            for event in events:
+                writer.append(event_id, image)
+    """
+
+    def __init__(self, filename, n_pixels, dtype=np.float32,
+                 buffer_size=1000):
+        """
+        :param filename: path to the HDF5 file to create
+        :param n_pixels: number of pixels of the images
+        :param dtype: data type used to store the values, f.e. np.float16
+        to reduce further the size of the file.
+        :param buffer_size: number of images written to the file at once
+        """
+        self.n_pixels = n_pixels
+        self.buffer_size = buffer_size
+        self.file = h5py.File(filename, 'w')
+        self.file.attrs['n_pixels'] = n_pixels
+        pixel_id_dtype = np.uint16 if n_pixels <= 2 ** 16 else np.uint32
+        self.datasets = {
+            'event_id': self._create_dataset('event_id', np.int64),
+            'indptr': self._create_dataset('indptr', np.int64),
+            'pixel_id': self._create_dataset('pixel_id', pixel_id_dtype),
+            'value': self._create_dataset('value', dtype),
+        }
+        self._append_to_dataset('indptr', np.zeros(1, dtype=np.int64))
+        self.n_entries = 0
+        self.event_ids = []
+        self.pixel_ids = []
+        self.values = []
+
+    def _create_dataset(self, name, dtype):
+        return self.file.create_dataset(name, shape=(0, ), maxshape=(None, ),
+                                        dtype=dtype, chunks=True)
+
+    def _append_to_dataset(self, name, values):
+        dataset = self.datasets[name]
+        n_rows = len(dataset)
+        dataset.resize((n_rows + len(values), ))
+        dataset[n_rows:] = values
+
+    def append(self, event_id, image):
+        """
+        Add an image to the buffer, writing the buffer if it is full.
+        :param event_id: event id of the image
+        :param image: array of n_pixels values. Pixels equal to 0 are not
+        stored.
+        """
+        pixel_id = np.flatnonzero(image)
+        self.event_ids.append(event_id)
+        self.pixel_ids.append(pixel_id)
+        self.values.append(image[pixel_id])
+        if len(self.event_ids) == self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.event_ids) == 0:
+            return
+        n_entries = np.array([len(pixel_id) for pixel_id in self.pixel_ids])
+        indptr = self.n_entries + np.cumsum(n_entries)
+        self._append_to_dataset('event_id', self.event_ids)
+        self._append_to_dataset('indptr', indptr)
+        self._append_to_dataset('pixel_id', np.concatenate(self.pixel_ids))
+        self._append_to_dataset('value', np.concatenate(self.values))
+        self.n_entries = indptr[-1]
+        self.event_ids = []
+        self.pixel_ids = []
+        self.values = []
+
+    def close(self):
+        if not self.file:
+            return
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SparseImages:
+    """
+    Images of a zero-suppressed HDF5 file, c.f. the module documentation for
+    the format. The file is read at once, the images are decoded to dense
+    arrays on demand with dense().
+    """
+
+    def __init__(self, filename):
+        with h5py.File(filename, 'r') as file:
+            self.n_pixels = int(file.attrs['n_pixels'])
+            self.event_id = file['event_id'][:]
+            self.indptr = file['indptr'][:]
+            self.pixel_id = file['pixel_id'][:]
+            self.value = file['value'][:]
+
+    def __len__(self):
+        return len(self.event_id)
+
+    def dense(self, rows=None, dtype=np.float64):
+        """
+        :param rows: indices (or boolean mask) of the images to decode.
+        If None, all images are decoded.
+        :param dtype: data type of the output
+        :return: array of shape (n_images, n_pixels)
+        """
+        return sparse_to_dense(self.indptr, self.pixel_id, self.value,
+                               self.n_pixels, rows=rows, dtype=dtype)
+
+
+def sparse_to_dense(indptr, pixel_id, value, n_pixels, rows=None,
+                    dtype=np.float64):
+    """
+    Decode CSR images to dense images, without loop over the images.
+    :param indptr: (n_images + 1, ) array of the first entry of each image
+    :param pixel_id: (n_entries, ) array of the pixel ids
+    :param value: (n_entries, ) array of the pixel values
+    :param n_pixels: number of pixels of the images
+    :param rows: indices (or boolean mask) of the images to decode.
+    If None, all images are decoded.
+    :param dtype: data type of the output
+    :return: array of shape (n_images, n_pixels)
+    """
+    n_images = len(indptr) - 1
+    if rows is None:
+        rows = np.arange(n_images)
+    rows = np.arange(n_images)[rows]
+    starts = indptr[rows]
+    n_entries = indptr[rows + 1] - starts
+    # index in pixel_id and value of all the entries of the selected rows
+    first_entry_of_row = np.cumsum(n_entries) - n_entries
+    entries = np.arange(np.sum(n_entries)) + \
+        np.repeat(starts - first_entry_of_row, n_entries)
+    images = np.zeros((len(rows), n_pixels), dtype=dtype)
+    images[np.repeat(np.arange(len(rows)), n_entries),
+           pixel_id[entries]] = value[entries]
+    return images
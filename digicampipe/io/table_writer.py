@@ -0,0 +1,247 @@
+"""
+Buffered writer of tables, one row per event.
+Rows are accumulated in a fixed-size buffer and appended to the output file
+each time the buffer is full, so the memory used does not grow with the run
+and a crash only loses the rows of the last buffer. The output is a FITS
+binary table (written with fitsio) or, if the file name ends with .h5 or
+.hdf5, an HDF5 compound dataset named TABLE_NAME. In both cases the units of
+the quantities are stored along the columns.
+"""
+import os
+
+import fitsio
+import h5py
+import numpy as np
+from astropy.units import Quantity
+
+__all__ = ['TableWriter', 'guess_table_format', 'read_schema',
+           'read_chunks']
+
+TABLE_NAME = 'events'
+
+
+def guess_table_format(filename):
+    if filename.endswith(('.h5', '.hdf5')):
+        return 'hdf5'
+    return 'fits'
+
+
+class TableWriter:
+    """
+    Write rows of scalars or arrays to a FITS or HDF5 table.
+    The columns and their types are set by the first row (or by the existing
+    table in append mode).
+    Usage:
+        with TableWriter(filename, buffer_size=1000) as writer:
+            for event in events:
+                container.x = ...
+                writer.add_container(container)
+    """
+
+    def __init__(self, filename, mode='w', format=None, buffer_size=1000):
+        """
+        :param filename: path of the output file
+        :param mode: 'w' to create the file (any existing one is removed
+        here, so no stale table is left if no row is written) or 'a' to
+        append the rows to an existing table.
+        In append mode, the rows must have the same columns as the table.
+        If the file does not exist, it is created.
+        :param format: 'fits' or 'hdf5'. If None, it is guessed from the
+        file name (c.f. guess_table_format()).
+        :param buffer_size: number of rows written to the file at once
+        """
+        if mode not in ['w', 'a']:
+            raise ValueError('mode must be "w" or "a", not {}'.format(mode))
+        if format is None:
+            format = guess_table_format(filename)
+        if format not in ['fits', 'hdf5']:
+            raise ValueError('format must be "fits" or "hdf5", not {}'
+                             .format(format))
+        self.filename = filename
+        self.format = format
+        self.buffer_size = buffer_size
+        self.buffer = None
+        self.units = None
+        self.n_buffered = 0
+        self.n_rows = 0  # number of rows written by this writer
+        if mode == 'w' and os.path.isfile(filename):
+            os.remove(filename)
+        self.file_exists = mode == 'a' and os.path.isfile(filename)
+        if self.file_exists:
+            dtype, units, _ = read_schema(filename, format=format)
+            self._create_buffer(dtype, units)
+
+    def _create_buffer(self, dtype, units):
+        self.buffer = np.zeros(self.buffer_size, dtype=dtype)
+        self.units = units
+
+    def add_container(self, container):
+        """
+        Add the fields of a ctapipe Container as a row.
+        Same interface as ctapipe.io.serializer.Serializer.
+        """
+        self.append(dict(container.items()))
+
+    def append(self, row):
+        """
+        Copy a row to the buffer, writing the buffer to the file if full.
+        :param row: dictionary of the column values. Quantities are stored
+        as their value, in the unit of the first row.
+        """
+        if self.buffer is None:
+            self._create_buffer(*_get_row_dtype(row))
+        elif set(row.keys()) != set(self.buffer.dtype.names):
+            raise ValueError('The columns of the row {} differ from the ones '
+                             'of the table {}'.format(
+                                 sorted(row.keys()),
+                                 sorted(self.buffer.dtype.names)))
+        buffer_row = self.buffer[self.n_buffered]
+        for name, value in row.items():
+            if isinstance(value, Quantity):
+                unit = self.units.get(name)
+                value = value.value if unit is None else value.to_value(unit)
+            buffer_row[name] = value
+        self.n_buffered += 1
+        if self.n_buffered == self.buffer_size:
+            self.flush()
+
+    def append_rows(self, rows, units=None):
+        """
+        Write a block of rows at once, bypassing the buffer.
+        :param rows: structured array, with the fields of the table
+        :param units: dictionary of the units of the columns, only used if
+        the table is created by these rows.
+        """
+        if self.buffer is None:
+            if units is None:
+                units = {}
+            self._create_buffer(rows.dtype, units)
+        self.flush()
+        self._write(np.asarray(rows, dtype=self.buffer.dtype))
+
+    def flush(self):
+        if self.n_buffered == 0:
+            return
+        self._write(self.buffer[:self.n_buffered])
+        self.n_buffered = 0
+
+    def _write(self, rows):
+        if len(rows) == 0:
+            return
+        if self.format == 'hdf5':
+            self._write_hdf5(rows)
+        else:
+            self._write_fits(rows)
+        self.file_exists = True
+        self.n_rows += len(rows)
+
+    def _write_hdf5(self, rows):
+        if not self.file_exists:
+            with h5py.File(self.filename, 'w') as file:
+                dataset = file.create_dataset(
+                    TABLE_NAME, data=rows, maxshape=(None, ), chunks=True
+                )
+                for name, unit in self.units.items():
+                    dataset.attrs[name + '_unit'] = unit
+            return
+        with h5py.File(self.filename, 'a') as file:
+            dataset = file[TABLE_NAME]
+            n_rows = len(dataset)
+            dataset.resize((n_rows + len(rows), ))
+            dataset[n_rows:] = rows
+
+    def _write_fits(self, rows):
+        if not self.file_exists:
+            names = rows.dtype.names
+            units = [self.units.get(name, '') for name in names]
+            with fitsio.FITS(self.filename, 'rw', clobber=True) as file:
+                file.write(rows, units=units)
+            return
+        with fitsio.FITS(self.filename, 'rw') as file:
+            file[1].append(rows)
+
+    def close(self):
+        """
+        Write the remaining rows.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_schema(filename, format=None):
+    """
+    Read the columns of a table written by TableWriter (or any FITS binary
+    table in the first extension) from the file header, without reading the
+    rows.
+    :param filename: path of the table
+    :param format: 'fits' or 'hdf5'. If None, it is guessed from the
+    file name (c.f. guess_table_format()).
+    :return: the dtype of the rows (FITS logical columns are bool), the
+    dictionary of the units of the columns and the number of rows.
+    """
+    if format is None:
+        format = guess_table_format(filename)
+    if format == 'hdf5':
+        with h5py.File(filename, 'r') as file:
+            dataset = file[TABLE_NAME]
+            units = {
+                name: dataset.attrs[name + '_unit']
+                for name in dataset.dtype.names
+                if name + '_unit' in dataset.attrs
+            }
+            return dataset.dtype, units, len(dataset)
+    with fitsio.FITS(filename) as file:
+        dtype = file[1].get_rec_dtype()[0]
+        header = file[1].read_header()
+        n_rows = file[1].get_nrows()
+    units = {}
+    for i, name in enumerate(dtype.names):
+        unit = header.get('TUNIT{}'.format(i + 1), '').strip()
+        if unit != '':
+            units[name] = unit
+    return dtype, units, n_rows
+
+
+def read_chunks(filename, chunk_size=10000, format=None):
+    """
+    Read the rows of a table by blocks, such that the table does not have
+    to fit in memory.
+    :param filename: path of the table
+    :param chunk_size: maximum number of rows per block
+    :param format: 'fits' or 'hdf5'. If None, it is guessed from the
+    file name (c.f. guess_table_format()).
+    :return: generator of structured arrays
+    """
+    if format is None:
+        format = guess_table_format(filename)
+    if format == 'hdf5':
+        with h5py.File(filename, 'r') as file:
+            dataset = file[TABLE_NAME]
+            for start in range(0, len(dataset), chunk_size):
+                yield dataset[start:start + chunk_size]
+        return
+    with fitsio.FITS(filename) as file:
+        hdu = file[1]
+        n_rows = hdu.get_nrows()
+        for start in range(0, n_rows, chunk_size):
+            yield hdu[start:min(start + chunk_size, n_rows)]
+
+
+def _get_row_dtype(row):
+    dtype = []
+    units = {}
+    for name, value in row.items():
+        if isinstance(value, Quantity):
+            units[name] = value.unit.to_string()
+            value = value.value
+        value = np.asarray(value)
+        if value.dtype.kind == 'O':
+            raise ValueError('Column {} of type {} can not be stored'.format(
+                name, value.dtype))
+        dtype.append((name, value.dtype, value.shape))
+    return np.dtype(dtype), units
@@ -4,18 +4,30 @@ Components to read ZFITS data.
 This requires the protozfits python library to be installed
 """
 import logging
+import multiprocessing
+import queue
+import traceback
 import warnings
+from contextlib import ExitStack, closing
+from functools import partial, reduce
 
 import numpy as np
-from protozfits import File
+from protozfits import File, any_array_to_numpy
 from tqdm import tqdm
 
 from digicampipe.instrument import camera
-from digicampipe.io.containers import DataContainer
+from digicampipe.io.containers import DataContainer, R0BatchContainer
+from digicampipe.io.index import get_index, load_index, is_bounded, \
+    select_rows
+from digicampipe.io.prefetch import read_ahead
+from digicampipe.utils.precision import as_float, get_float_dtype
+from digicampipe.utils.ring_buffer import RingBuffer
 
 logger = logging.getLogger(__name__)
 
-__all__ = ['zfits_event_source']
+__all__ = ['zfits_event_source', 'zfits_batch_source',
+           'zfits_parallel_event_source', 'split_rows', 'map_shards',
+           'read_headers', 'build_event_index', 'get_event_index']
 
 
 def _binary_search(file, item):
@@ -44,7 +56,12 @@ def zfits_event_source(
         max_events=None,
         allowed_tels=None,
         event_id=None,
-        disable_bar=False
+        disable_bar=False,
+        event_id_range=(None, None),
+        time_range=(None, None),
+        prefetch=0,
+        ring_size=None,
+        row_range=(None, None),
 ):
     """A generator that streams data from an ZFITs data file
     Parameters
@@ -64,22 +81,53 @@ def zfits_event_source(
         it will return the closest past event. If the event ID is out of the
         range of the file it will raise an IndexError
     disable_bar: If set to true, the progress bar is not shown.
+    event_id_range: minimum (excluded) and maximum (included) camera event
+    number to be returned. Set one of them to None to disable that limit.
+    time_range: minimum (included) and maximum (excluded) local camera clock
+    in ns of the events to be returned. Set one of them to None to disable
+    that limit.
+    If any limit of event_id_range or time_range is set, the event index of
+    the file (c.f. get_event_index()) is used to only decode the events in
+    the ranges. The index is built and saved the first time it is needed.
+    prefetch: number of events read in advance by a background thread
+    (c.f. digicampipe.io.prefetch.read_ahead()). If 0, no thread is used.
+    ring_size: if set, the adc samples are written in a ring of ring_size
+    preallocated arrays (c.f. digicampipe.utils.ring_buffer.RingBuffer())
+    instead of a new array per event. The adc_samples of an event are then
+    valid until ring_size other events are read, so later stages can keep
+    references to the last events without copying them.
+    row_range: first (included) and last (excluded) row of the file to be
+    read, such that a file can be split in shards processed in parallel
+    (c.f. split_rows() and map_shards()). Set one of them to None to
+    disable that limit. If any limit is set, the event_id of the events
+    is their row in the file, as in zfits_batch_source().
     """
     data = DataContainer()
+    adc_samples_rings = {}
 
-    with File(url) as file:
+    with File(url) as file, ExitStack() as stack:
         loaded_telescopes = []
 
         n_events_in_file = len(file.Events)
         events = file.Events
-        index_of_event = 0
+        first_row, last_row = _get_rows(n_events_in_file, row_range)
+        index_of_event = first_row
+        selected_rows = None
 
         if event_id is not None:
 
-            index_of_event = _binary_search(file, event_id)
-
-            first_event_id = file.Events[0].eventNumber
-            last_event_id = file.Events[n_events_in_file - 1].eventNumber
+            index = load_index(url)
+            if index is None:
+                index_of_event = _binary_search(file, event_id)
+                first_event_id = file.Events[0].eventNumber
+                last_event_id = file.Events[n_events_in_file - 1].eventNumber
+            else:
+                event_numbers = index['event_number']
+                index_of_event = np.searchsorted(
+                    event_numbers, event_id, side='right'
+                ) - 1
+                first_event_id = event_numbers[0]
+                last_event_id = event_numbers[-1]
             if not first_event_id <= event_id <= last_event_id:
                 raise IndexError('Cannot find event ID {} in File {}\n'
                                  'First event ID : {}\n'
@@ -87,9 +135,34 @@ def zfits_event_source(
                                                              first_event_id,
                                                              last_event_id))
 
-            events = events[max(index_of_event, 0):]
+            index_of_event = max(index_of_event, first_row)
+
+        if is_bounded(event_id_range) or is_bounded(time_range):
+
+            index = get_event_index(url)
+            selected_rows = select_rows(index, event_id_range, time_range)
+            rows = np.flatnonzero(selected_rows)
+            if len(rows) == 0:
+                return
+            index_of_event = max(index_of_event, rows[0])
+            last_row = min(last_row, rows[-1] + 1)
+
+        if index_of_event >= last_row:
+            return
+
+        if index_of_event > 0 or last_row < n_events_in_file:
+
+            events = events[index_of_event:last_row]
+
+        if prefetch:
+            # stopped before the file gets closed
+            events = stack.enter_context(
+                closing(read_ahead(events, prefetch))
+            )
 
         n_steps = n_events_in_file if max_events is None else max_events
+        # rows skipped by the ranges do not count toward max_events
+        n_yielded_events = 0
 
         for event_counter, event in tqdm(
                 enumerate(events),
@@ -99,10 +172,18 @@ def zfits_event_source(
                 disable=disable_bar,
                 total=n_steps
         ):
-            if max_events is not None and event_counter > max_events:
+            if selected_rows is not None and \
+                    not selected_rows[index_of_event + event_counter]:
+                continue
+
+            if max_events is not None and n_yielded_events > max_events:
                 break
 
-            data.r0.event_id = event_counter
+            if is_bounded(row_range):
+                # row of the file, the same for all the shards
+                data.r0.event_id = index_of_event + event_counter
+            else:
+                data.r0.event_id = event_counter
             data.r0.tels_with_data = [event.telescopeID, ]
 
             # remove forbidden telescopes
@@ -148,58 +229,572 @@ def zfits_event_source(
                 r0 = data.r0.tel[tel_id]
                 r0.camera_event_number = event.eventNumber
                 r0.pixel_flags = event.pixels_flags[_sort_ids]
-                r0.local_camera_clock = (
-                    np.int64(event.local_time_sec * 1E9) +
-                    np.int64(event.local_time_nanosec)
-                )
-                r0.gps_time = (
-                    np.int64(event.trig.timeSec * 1E9) +
-                    np.int64(event.trig.timeNanoSec)
-                )
+                r0.local_camera_clock = _get_local_camera_clock(event)
+                r0.gps_time = _get_gps_time(event)
                 r0.camera_event_type = event.event_type
                 r0.array_event_type = event.eventType
-                r0.adc_samples = samples[_sort_ids]
-
-                if len(event.trigger_input_traces) > 0:
-                    r0.trigger_input_traces = _prepare_trigger_input(
-                        event.trigger_input_traces
+                if ring_size:
+                    if tel_id not in adc_samples_rings:
+                        adc_samples_rings[tel_id] = RingBuffer(
+                            ring_size, shape=samples.shape,
+                            dtype=samples.dtype
+                        )
+                    r0.adc_samples = np.take(
+                        samples, _sort_ids, axis=0,
+                        out=adc_samples_rings[tel_id].next_slot()
                     )
                 else:
-                    warnings.warn(
-                        'trigger_input_traces does not exist: --> nan')
-                    r0.trigger_input_traces = np.zeros(
-                        (432, data.inst.num_samples[tel_id])) * np.nan
-
-                if len(event.trigger_output_patch7) > 0:
-                    r0.trigger_output_patch7 = _prepare_trigger_output(
-                        event.trigger_output_patch7)
-                else:
-                    warnings.warn(
-                        'trigger_output_patch7 does not exist: --> nan')
-                    r0.trigger_output_patch7 = np.zeros(
-                        (432, data.inst.num_samples[tel_id])) * np.nan
-
-                if len(event.trigger_output_patch19) > 0:
-                    r0.trigger_output_patch19 = _prepare_trigger_output(
-                        event.trigger_output_patch19)
-                else:
-                    warnings.warn(
-                        'trigger_output_patch19 does not exist: --> nan')
-                    r0.trigger_output_patch19 = np.zeros(
-                        (432, data.inst.num_samples[tel_id])) * np.nan
+                    r0.adc_samples = samples[_sort_ids]
 
-                r0.digicam_baseline = unsorted_baseline[_sort_ids] / 16
+                # decoding of the trigger traces is deferred until they
+                # are accessed, most analyses do not use them
+                n_samples = data.inst.num_samples[tel_id]
+                r0.trigger_input_traces = partial(
+                    _get_trigger_input, event.trigger_input_traces, n_samples
+                )
+                r0.trigger_output_patch7 = partial(
+                    _get_trigger_output, event.trigger_output_patch7,
+                    n_samples, 'trigger_output_patch7'
+                )
+                r0.trigger_output_patch19 = partial(
+                    _get_trigger_output, event.trigger_output_patch19,
+                    n_samples, 'trigger_output_patch19'
+                )
+
+                r0.digicam_baseline = \
+                    as_float(unsorted_baseline[_sort_ids]) / 16
 
+            n_yielded_events += 1
             yield data
 
 
-def count_number_events(file_list):
-    return sum(
-        len(File(filename).Events)
-        for filename in file_list
+def zfits_batch_source(
+        url,
+        batch_size=1000,
+        max_events=None,
+        disable_bar=False,
+        row_range=(None, None),
+        prefetch=0,
+):
+    """A generator that streams blocks of events from an ZFITs data file.
+    Instead of one DataContainer per event, it yields a R0BatchContainer
+    holding contiguous arrays for `batch_size` consecutive events, such that
+    the processing can be vectorized across events.
+    Parameters
+    ----------
+    url : str
+        path to file to open
+    batch_size : int
+        number of events per block. The last block of the file can be
+        smaller.
+    max_events : int, optional
+        maximum number of events to read
+    disable_bar: If set to true, the progress bar is not shown.
+    row_range: first (included) and last (excluded) row of the file to be
+    read. Set one of them to None to disable that limit.
+    prefetch: number of events read in advance by a background thread
+    (c.f. digicampipe.io.prefetch.read_ahead()). If 0, no thread is used.
+    """
+    batch = R0BatchContainer()
+
+    with File(url) as file, ExitStack() as stack:
+
+        first_row, last_row = _get_rows(len(file.Events), row_range)
+        n_events = last_row - first_row
+        if max_events is not None:
+            n_events = min(n_events, max_events)
+
+        events = file.Events
+        if first_row > 0 or last_row < len(file.Events):
+            events = events[first_row:last_row]
+
+        if prefetch:
+            events = stack.enter_context(
+                closing(read_ahead(events, prefetch))
+            )
+
+        _sort_ids = None
+        index_in_batch = 0
+
+        for event_counter, event in tqdm(
+                enumerate(events),
+                desc='Events',
+                leave=True,
+                disable=disable_bar,
+                total=n_events
+        ):
+            if event_counter >= n_events:
+                break
+
+            pixel_ids = event.hiGain.waveforms.pixelsIndices
+            n_pixels = len(pixel_ids)
+            if _sort_ids is None:
+                _sort_ids = np.argsort(pixel_ids)
+            samples = event.hiGain.waveforms.samples.reshape(n_pixels, -1)
+
+            if index_in_batch == 0:
+                n_events_in_batch = min(batch_size, n_events - event_counter)
+                batch.tel_id = event.telescopeID
+                batch.event_id = np.zeros(n_events_in_batch, dtype=int)
+                batch.camera_event_number = np.zeros(n_events_in_batch,
+                                                     dtype=int)
+                batch.local_camera_clock = np.zeros(n_events_in_batch,
+                                                    dtype=np.int64)
+                batch.gps_time = np.zeros(n_events_in_batch, dtype=np.int64)
+                batch.camera_event_type = np.zeros(n_events_in_batch,
+                                                   dtype=int)
+                batch.array_event_type = np.zeros(n_events_in_batch,
+                                                  dtype=int)
+                batch.adc_samples = np.zeros(
+                    (n_events_in_batch, ) + samples.shape,
+                    dtype=samples.dtype
+                )
+                batch.digicam_baseline = np.zeros(
+                    (n_events_in_batch, n_pixels), dtype=get_float_dtype()
+                )
+
+            batch.event_id[index_in_batch] = first_row + event_counter
+            batch.camera_event_number[index_in_batch] = event.eventNumber
+            batch.local_camera_clock[index_in_batch] = \
+                _get_local_camera_clock(event)
+            batch.gps_time[index_in_batch] = _get_gps_time(event)
+            batch.camera_event_type[index_in_batch] = event.event_type
+            batch.array_event_type[index_in_batch] = event.eventType
+            np.take(samples, _sort_ids, axis=0,
+                    out=batch.adc_samples[index_in_batch])
+
+            try:
+                unsorted_baseline = event.hiGain.waveforms.baselines
+                batch.digicam_baseline[index_in_batch] = \
+                    unsorted_baseline[_sort_ids] / 16
+            except AttributeError:
+                warnings.warn((
+                    "Could not read `hiGain.waveforms.baselines`"
+                    "for event:{}\n"
+                    "of file:{}\n".format(event_counter, url)
+                ))
+                batch.digicam_baseline[index_in_batch] = np.nan
+
+            index_in_batch += 1
+
+            if index_in_batch == len(batch.event_id):
+                index_in_batch = 0
+                yield batch
+
+
+def zfits_parallel_event_source(
+        file_list,
+        n_workers,
+        camera=camera.DigiCam,
+        max_events=None,
+        disable_bar=False,
+        batch_size=500,
+        event_id_range=(None, None),
+        time_range=(None, None),
+):
+    """A generator that streams data from a list of ZFITs data files decoded
+    by n_workers processes in parallel.
+    The files are split in blocks of batch_size events. The blocks are
+    decoded by the worker processes (c.f. zfits_batch_source()) which write
+    the waveforms into shared memory buffers. The events are yielded in the
+    same order as with zfits_event_source() for each file.
+    Only the raw data (adc samples, DigiCam baseline, event numbers, event
+    types and time stamps) is filled, the trigger traces are not available.
+    The adc_samples of the events are views of the shared buffers, they are
+    valid until the events of the next block are read.
+    Parameters
+    ----------
+    file_list : list of str
+        paths to the files to open
+    n_workers : int
+        number of decoding processes
+    camera : digicampipe.instrument.Camera(), default DigiCam
+    max_events : int, optional
+        maximum number of events to read
+    disable_bar: If set to true, the progress bar is not shown.
+    batch_size : int
+        number of events decoded at once by a worker
+    event_id_range, time_range: c.f. zfits_event_source(). If any limit is
+    set, the event index of each file is used such that only the blocks
+    with events in the ranges are decoded.
+    """
+    tasks = []
+    # for each task, the rows to be returned (None for all)
+    task_selections = []
+    n_events = 0
+    for url in file_list:
+        if max_events is not None and n_events >= max_events:
+            break
+        with File(url) as file:
+            n_events_in_file = len(file.Events)
+        selected_rows = None
+        if is_bounded(event_id_range) or is_bounded(time_range):
+            index = get_event_index(url)
+            selected_rows = select_rows(index, event_id_range, time_range)
+        for first_row in range(0, n_events_in_file, batch_size):
+            if max_events is not None and n_events >= max_events:
+                break
+            last_row = min(first_row + batch_size, n_events_in_file)
+            selection = None
+            n_events_in_task = last_row - first_row
+            if selected_rows is not None:
+                selection = selected_rows[first_row:last_row]
+                n_events_in_task = np.count_nonzero(selection)
+                if n_events_in_task == 0:
+                    continue
+            tasks.append((url, first_row, last_row))
+            task_selections.append(selection)
+            n_events += n_events_in_task
+    if len(tasks) == 0:
+        return
+    if max_events is not None:
+        n_events = min(n_events, max_events)
+
+    # the shape of the waveforms is needed to allocate the shared buffers
+    with File(tasks[0][0]) as file:
+        event = file.Events[0]
+        n_pixels = len(event.hiGain.waveforms.pixelsIndices)
+        samples = event.hiGain.waveforms.samples.reshape(n_pixels, -1)
+        dtype = samples.dtype
+        n_samples = samples.shape[1]
+    batch_shape = (batch_size, n_pixels, n_samples)
+
+    # 2 buffers per worker so workers decode the next blocks while the
+    # events of the current block are consumed.
+    n_buffers = 2 * n_workers
+    buffers = [
+        multiprocessing.RawArray('b', int(np.prod(batch_shape)) *
+                                 dtype.itemsize)
+        for _ in range(n_buffers)
+    ]
+    task_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=_decode_worker,
+            args=(buffers, batch_shape, dtype, task_queue, result_queue),
+            daemon=True,
+        )
+        for _ in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    data = DataContainer()
+    loaded_telescopes = []
+    free_buffers = list(range(n_buffers))
+    # buffer of the block being yielded, it is given back to the workers
+    # once the next block is read
+    used_buffer = None
+    results = {}
+    next_task = 0
+    count = 0
+    progress_bar = tqdm(desc='Events', total=n_events, disable=disable_bar)
+
+    try:
+        for task_id in range(len(tasks)):
+            if used_buffer is not None:
+                free_buffers.append(used_buffer)
+                used_buffer = None
+            # tasks are submitted in order, so the buffer of the next
+            # block to yield is always assigned before the others
+            while len(free_buffers) > 0 and next_task < len(tasks):
+                task_queue.put(
+                    (next_task, ) + tasks[next_task] + (free_buffers.pop(), )
+                )
+                next_task += 1
+            while task_id not in results:
+                result = _get_result(result_queue, workers)
+                results[result[0]] = result
+            _, buffer_id, batch, error = results.pop(task_id)
+            if error is not None:
+                raise RuntimeError(
+                    'Failed to decode rows [{}, {}[ of {}:\n{}'.format(
+                        tasks[task_id][1], tasks[task_id][2],
+                        tasks[task_id][0], error)
+                )
+            n_events_in_batch = len(batch.event_id)
+            adc_samples = np.frombuffer(buffers[buffer_id], dtype=dtype)
+            adc_samples = adc_samples.reshape(batch_shape)
+            batch.adc_samples = adc_samples[:n_events_in_batch]
+            used_buffer = buffer_id
+
+            tel_id = batch.tel_id
+            data.r0.tels_with_data = [tel_id, ]
+            if tel_id not in loaded_telescopes:
+                data.inst.num_channels[tel_id] = 1
+                data.inst.geom[tel_id] = camera.geometry
+                data.inst.cluster_matrix_7[tel_id] = camera.cluster_7_matrix
+                data.inst.cluster_matrix_19[tel_id] = \
+                    camera.cluster_19_matrix
+                data.inst.patch_matrix[tel_id] = camera.patch_matrix
+                data.inst.num_pixels[tel_id] = n_pixels
+                data.inst.num_samples[tel_id] = n_samples
+                loaded_telescopes.append(tel_id)
+            r0 = data.r0.tel[tel_id]
+
+            selection = task_selections[task_id]
+            for i in range(n_events_in_batch):
+                if max_events is not None and count >= max_events:
+                    return
+                if selection is not None and not selection[i]:
+                    continue
+                data.r0.event_id = batch.event_id[i]
+                r0.camera_event_number = batch.camera_event_number[i]
+                r0.local_camera_clock = batch.local_camera_clock[i]
+                r0.gps_time = batch.gps_time[i]
+                r0.camera_event_type = batch.camera_event_type[i]
+                r0.array_event_type = batch.array_event_type[i]
+                r0.adc_samples = batch.adc_samples[i]
+                r0.digicam_baseline = batch.digicam_baseline[i]
+                count += 1
+                progress_bar.update(1)
+                yield data
+    finally:
+        progress_bar.close()
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+
+
+def _get_result(result_queue, workers, poll_interval=1):
+    """
+    Wait for the next result of the decoding workers, checking regularly
+    that none of them died (f.e. killed when out of memory), in which case
+    its result would never come.
+    """
+    while True:
+        try:
+            return result_queue.get(timeout=poll_interval)
+        except queue.Empty:
+            pass
+        for worker in workers:
+            if not worker.is_alive():
+                raise RuntimeError(
+                    'A decoding worker (pid {}) died with exit code {}'
+                    .format(worker.pid, worker.exitcode)
+                )
+
+
+def _decode_worker(buffers, batch_shape, dtype, task_queue, result_queue):
+    buffers = [
+        np.frombuffer(buffer, dtype=dtype).reshape(batch_shape)
+        for buffer in buffers
+    ]
+    while True:
+        task_id, url, first_row, last_row, buffer_id = task_queue.get()
+        batch = None
+        try:
+            for batch in zfits_batch_source(url,
+                                            batch_size=last_row - first_row,
+                                            row_range=(first_row, last_row),
+                                            disable_bar=True):
+                n_events_in_batch = len(batch.event_id)
+                buffers[buffer_id][:n_events_in_batch] = batch.adc_samples
+                # the waveforms go through the shared buffer only
+                batch.adc_samples = None
+            result_queue.put((task_id, buffer_id, batch, None))
+        except Exception:
+            result_queue.put((task_id, buffer_id, None,
+                              traceback.format_exc()))
+
+
+def split_rows(url, n_shards):
+    """
+    Split the rows of a ZFITs file in consecutive shards of similar size.
+    :param url: path to the ZFITs data file
+    :param n_shards: number of shards
+    :return: list of (first row, last row) of each shard, the last row being
+    excluded. Empty shards are not returned.
+    """
+    n_events = count_number_events([url])
+    bounds = np.linspace(0, n_events, n_shards + 1).astype(int)
+    return [
+        (int(first_row), int(last_row))
+        for first_row, last_row in zip(bounds[:-1], bounds[1:])
+        if last_row > first_row
+    ]
+
+
+def map_shards(function, url, n_shards, n_workers=None, merge=None,
+               **kwargs):
+    """
+    Process a ZFITs file in shards of rows, each shard in its own process.
+    :param function: function called for each shard as
+    function(url, row_range, **kwargs). Typically it loops over
+    zfits_event_source(url, row_range=row_range) and returns a histogram or
+    a table. It must be defined at module level to be sent to the workers.
+    :param url: path to the ZFITs data file
+    :param n_shards: number of shards, c.f. split_rows()
+    :param n_workers: number of processes. If None, one per shard.
+    :param merge: function merging the results of 2 shards. If given, it is
+    applied to the results in the order of the shards, such that the
+    output does not depend on which worker finished first.
+    :param kwargs: parameters passed to function
+    :return: the list of the results of the shards in the order of the
+    rows, or the merged result if merge is given.
+    """
+    shards = split_rows(url, n_shards)
+    if n_workers is None:
+        n_workers = len(shards)
+    with multiprocessing.Pool(n_workers) as pool:
+        results = pool.map(partial(_process_shard, function, url, kwargs),
+                           shards)
+    if merge is None:
+        return results
+    return reduce(merge, results)
+
+
+def _process_shard(function, url, kwargs, row_range):
+    return function(url, row_range, **kwargs)
+
+
+def read_headers(file_list, max_events=None, baseline=False,
+                 disable_bar=False, event_id_range=(None, None),
+                 time_range=(None, None)):
+    """
+    Read only the headers of the events of ZFITs data files.
+    The events are parsed without converting the waveforms and the trigger
+    traces to numpy arrays, which is much faster than a full event source
+    when only event numbers, times and types are needed.
+    :param file_list: path or list of paths to the ZFITs data files
+    :param max_events: maximum number of events to read.
+    If None, all events are read.
+    :param baseline: if True, the mean over the pixels of the DigiCam
+    baseline is read too (this requires decoding the baselines).
+    :param disable_bar: If set to true, the progress bar is not shown.
+    :param event_id_range: minimum (excluded) and maximum (included) camera
+    event number to be read. Set one of them to None to disable that limit.
+    :param time_range: minimum (included) and maximum (excluded) local
+    camera clock in ns of the events to be read. Set one of them to None to
+    disable that limit.
+    If any limit of event_id_range or time_range is set, the event index of
+    each file (c.f. get_event_index()) is used to only read the events in
+    the ranges.
+    :return: dictionary of 1D arrays with one entry per event giving the
+    event number, the local camera clock, the gps time, the camera event
+    type, the array event type and, if baseline is True, the mean baseline.
+    """
+    if isinstance(file_list, str):
+        file_list = [file_list]
+    if is_bounded(event_id_range) or is_bounded(time_range):
+        selections = [
+            select_rows(get_event_index(url), event_id_range, time_range)
+            for url in file_list
+        ]
+        n_events = sum(np.count_nonzero(rows) for rows in selections)
+    else:
+        selections = [None] * len(file_list)
+        n_events = count_number_events(file_list)
+    if max_events is not None:
+        n_events = min(n_events, max_events)
+    headers = {
+        'event_number': np.zeros(n_events, dtype=np.int64),
+        'local_camera_clock': np.zeros(n_events, dtype=np.int64),
+        'gps_time': np.zeros(n_events, dtype=np.int64),
+        'camera_event_type': np.zeros(n_events, dtype=np.int64),
+        'array_event_type': np.zeros(n_events, dtype=np.int64),
+    }
+    if baseline:
+        headers['baseline_mean'] = np.zeros(n_events, dtype=np.float32)
+    row = 0
+    bar = tqdm(total=n_events, desc='Headers', disable=disable_bar)
+    for url, selected_rows in zip(file_list, selections):
+        if row >= n_events:
+            break
+        # with pure_protobuf=True, the AnyArray fields are kept as bytes
+        # instead of being converted to numpy arrays.
+        with File(url, pure_protobuf=True) as file:
+            events = file.Events
+            first_row = 0
+            if selected_rows is not None:
+                rows = np.flatnonzero(selected_rows)
+                if len(rows) == 0:
+                    continue
+                first_row = rows[0]
+                events = events[first_row:rows[-1] + 1]
+            for file_row, event in enumerate(events, start=first_row):
+                if row >= n_events:
+                    break
+                if selected_rows is not None and \
+                        not selected_rows[file_row]:
+                    continue
+                headers['event_number'][row] = event.eventNumber
+                headers['local_camera_clock'][row] = \
+                    _get_local_camera_clock(event)
+                headers['gps_time'][row] = _get_gps_time(event)
+                headers['camera_event_type'][row] = event.event_type
+                headers['array_event_type'][row] = event.eventType
+                if baseline:
+                    baselines = any_array_to_numpy(
+                        event.hiGain.waveforms.baselines
+                    )
+                    headers['baseline_mean'][row] = np.mean(baselines) / 16
+                row += 1
+                bar.update(1)
+    bar.close()
+    return headers
+
+
+def build_event_index(url, disable_bar=True):
+    """
+    Read the headers of all the events of a ZFITs data file and return the
+    event index: a dictionary of arrays giving for each row of the file the
+    event number, the local camera clock, the gps time and the event type.
+    :param url: path to the ZFITs data file
+    :param disable_bar: If set to true, the progress bar is not shown.
+    :return: dictionary of 1D arrays
+    """
+    headers = read_headers(url, disable_bar=disable_bar)
+    return {
+        key: headers[key] for key in [
+            'event_number', 'local_camera_clock', 'gps_time',
+            'camera_event_type'
+        ]
+    }
+
+
+def get_event_index(url):
+    """
+    Get the event index of a ZFITs data file (c.f. build_event_index()).
+    The index is stored next to the data file (c.f. digicampipe.io.index)
+    so the file is read only the first time the index is needed.
+    :param url: path to the ZFITs data file
+    :return: dictionary of 1D arrays
+    """
+    return get_index(url, build_event_index)
+
+
+def _get_rows(n_rows, row_range):
+    first_row, last_row = row_range
+    first_row = 0 if first_row is None else max(first_row, 0)
+    last_row = n_rows if last_row is None else min(last_row, n_rows)
+    return first_row, max(first_row, last_row)
+
+
+def _get_local_camera_clock(event):
+    return (
+        np.int64(event.local_time_sec * 1E9) +
+        np.int64(event.local_time_nanosec)
     )
 
 
+def _get_gps_time(event):
+    return (
+        np.int64(event.trig.timeSec * 1E9) +
+        np.int64(event.trig.timeNanoSec)
+    )
+
+
+def count_number_events(file_list):
+    n_events = 0
+    for filename in file_list:
+        with File(filename, pure_protobuf=True) as file:
+            n_events += len(file.Events)
+    return n_events
+
+
 PATCH_ID_INPUT = [
     204, 216, 180, 192, 229, 241, 205, 217, 254, 266, 230, 242,
     279, 291, 255, 267, 304, 316, 280, 292, 329, 341, 305, 317, 156, 168, 132,
@@ -267,6 +862,20 @@ PATCH_ID_OUTPUT = [
 PATCH_ID_OUTPUT_SORT_IDS = np.argsort(PATCH_ID_OUTPUT)
 
 
+def _get_trigger_input(trigger_input_traces, n_samples):
+    if len(trigger_input_traces) > 0:
+        return _prepare_trigger_input(trigger_input_traces)
+    warnings.warn('trigger_input_traces does not exist: --> nan')
+    return np.zeros((432, n_samples)) * np.nan
+
+
+def _get_trigger_output(trigger_output, n_samples, name):
+    if len(trigger_output) > 0:
+        return _prepare_trigger_output(trigger_output)
+    warnings.warn('{} does not exist: --> nan'.format(name))
+    return np.zeros((432, n_samples)) * np.nan
+
+
 def _prepare_trigger_input(_a):
     A, B = 3, 192
     cut = 144
@@ -2,21 +2,30 @@
 """
 concatenate the input fits files to one output.
 Useful to merge the output of several runs (f.e. hillas.fits from pipeline.py)
+The columns are determined from the headers of the inputs, then the rows are
+copied by chunks, so the inputs do not need to fit in memory. Inputs and
+output can also be HDF5 tables (c.f. digicampipe.io.table_writer).
 
 Usage:
-  digicam-concatenate <OUTPUT> <INPUTS>...
+  digicam-concatenate [options] <OUTPUT> <INPUTS>...
 
 Options:
   -h --help                   Show this screen.
+  --chunk_size=N              Number of rows read and written at once.
+                              [Default: 10000]
 """
 
-from astropy.table import Table, vstack
 from docopt import docopt
 from glob import glob
 import os
 import re
 import numpy as np
 
+from digicampipe.io.table_writer import TableWriter, read_schema, \
+    read_chunks
+from digicampipe.utils.docopt import convert_int
+
+
 def tryint(s):
     try:
         return int(s)
@@ -31,41 +40,64 @@ def alphanum_key(s):
     return [tryint(c) for c in re.split('([0-9]+)', s)]
 
 
-def entry(inputs, output):
+def get_columns_type(inputs):
+    """
+    Get the type of each column, such that the rows of all inputs can be
+    converted without loss. Only the headers of the inputs are read.
+    :param inputs: list of table files
+    :return: dtype of the output rows and dictionary of the column units
+    (taken from the first input having a unit for that column)
+    """
+    columns_type = {}
+    columns_shape = {}
+    units = {}
+    for input in inputs:
+        dtype, input_units, _ = read_schema(input)
+        for name in dtype.names:
+            type, shape = dtype[name].base, dtype[name].shape
+            if name in columns_type.keys():
+                if columns_shape[name] != shape:
+                    raise ValueError(
+                        'column {} of {} has a shape {} different from {} in '
+                        'the other inputs'.format(name, input, shape,
+                                                  columns_shape[name]))
+                columns_type[name] = np.result_type(type, columns_type[name])
+            else:
+                columns_type[name] = type
+                columns_shape[name] = shape
+        for name, unit in input_units.items():
+            units.setdefault(name, unit)
+    dtype = np.dtype([
+        (name, type.newbyteorder('='), columns_shape[name])
+        for name, type in columns_type.items()
+    ])
+    return dtype, units
+
+
+def entry(inputs, output, chunk_size=10000):
     if len(inputs) < 1:
         raise AttributeError('digicam-concatenate must take 1 output and at '
                              'least 1 input file as arguments')
-    tables = []
+    existing_inputs = []
     for input in inputs:
         if os.path.isfile(input):
-            tables.append(Table.read(input))
+            existing_inputs.append(input)
         else:
             print('WARNING:', input, 'does not exist, skipping it.')
-    columns_type = {}
-    for table in tables:
-        for column_idx in range(len(table.columns)):
-            column = table.columns[column_idx]
-            type = column.dtype
-            if np.all(np.logical_or(column == 0, column==1)):
-                type = bool
-            if column.name in columns_type.keys():
-                columns_type[column.name] = np.result_type(
-                    type,
-                    columns_type[column.name]
-                )
-            else:
-                columns_type[column.name] = type
-    tables_stackable = []
-    for table in tables:
-        columns_converted = []
-        for key, val in columns_type.items():
-            columns_converted.append(table.columns[key].astype(val))
-        tables_stackable.append(Table(columns_converted))
-    result = vstack(tables_stackable)
+    dtype, units = get_columns_type(existing_inputs)
     if os.path.isfile(output):
         print('WARNING:', output, 'existed, overwriting it.')
         os.remove(output)
-    result.write(output)
+    with TableWriter(output, mode='w') as writer:
+        for input in existing_inputs:
+            for chunk in read_chunks(input, chunk_size=chunk_size):
+                rows = np.zeros(len(chunk), dtype=dtype)
+                for name in dtype.names:
+                    if name not in chunk.dtype.names:
+                        raise ValueError('column {} is missing in {}'.format(
+                            name, input))
+                    rows[name] = chunk[name]
+                writer.append_rows(rows, units=units)
 
 
 if __name__ == '__main__':
@@ -75,4 +107,5 @@ if __name__ == '__main__':
         inputs = glob(inputs[0])
         inputs.sort(key=alphanum_key)
     output = args['<OUTPUT>']
-    entry(inputs, output)
+    chunk_size = convert_int(args['--chunk_size'])
+    entry(inputs, output, chunk_size=chunk_size)
@@ -118,7 +118,10 @@ def data_quality(
     if not load_files:
         events = calibration_event_stream(files, disable_bar=disable_bar)
         events = add_slow_data_calibration(
-            events, basepath=aux_basepath, aux_services=aux_services
+            events, basepath=aux_basepath, aux_services=aux_services,
+            columns={
+                'DriveSystem': ['current_position_az', 'current_position_el']
+            },
         )
         events = fill_digicam_baseline(events)
         events = fill_dark_baseline(events, dark_baseline)
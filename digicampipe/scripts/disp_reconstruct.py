@@ -21,7 +21,7 @@ Options:
   -l <path>, --lookup=<path>  File with saved lookup \
 table for selected equation.
   -p <path>, --pixels=<path>  File with saved pixel coordinates.
-  -a <path>, --images=<path>  File with saved event images.
+  -a <path>, --images=<path>  File with saved event images (text, .npy or .h5).
   --modification    Turn on modified DISP method.
 '''
 
@@ -89,7 +89,10 @@ def nsb_rate(
                                           disable_bar=disable_bar)
         events = add_slow_data_calibration(
             events, basepath=aux_basepath,
-            aux_services=('DriveSystem', )
+            aux_services=('DriveSystem', ),
+            columns={
+                'DriveSystem': ['current_position_az', 'current_position_el']
+            },
         )
         data = {
             "baseline": [],
@@ -49,8 +49,9 @@ import matplotlib.animation as animation
 from matplotlib.dates import DateFormatter
 
 from digicampipe.io.event_stream import calibration_event_stream
+from digicampipe.io.zfits import read_headers
 from digicampipe.calib.baseline import fill_digicam_baseline
-from digicampipe.calib.tagging import tag_burst_from_moving_average_baseline
+from digicampipe.calib.tagging import tag_burst_from_baselines
 from digicampipe.utils.docopt import convert_text
 
 
@@ -59,14 +60,67 @@ def expand_mask(input, iters=1):
     Expands the True area in an 1D array 'input'.
     Expansion occurs by one cell, and is repeated 'iters' times.
     """
+    input = np.asarray(input, dtype=bool)
     xLen, = input.shape
-    output = input.copy()
-    for iter in range(iters):
-        for x in range(xLen):
-            if (x > 0 and input[x-1]) or (x < xLen - 1 and input[x+1]):
-                output[x] = True
-        input = output.copy()
-    return output
+    # number of True cells in input[:x] for each x
+    n_true = np.zeros(xLen + 1, dtype=int)
+    np.cumsum(input, out=n_true[1:])
+    index = np.arange(xLen)
+    window_begin = np.clip(index - iters, 0, xLen)
+    window_end = np.clip(index + iters + 1, 0, xLen)
+    return n_true[window_end] - n_true[window_begin] > 0
+
+
+def get_burst_intervals(are_burst):
+    """
+    Get the groups of consecutive True in a 1D boolean array.
+    :param are_burst: 1D boolean array
+    :return: arrays of the first and last index of each group
+    """
+    edges = np.diff(np.concatenate(([0], np.asarray(are_burst, int), [0])))
+    begin_idx = np.flatnonzero(edges == 1)
+    end_idx = np.flatnonzero(edges == -1) - 1
+    return begin_idx, end_idx
+
+
+def merge_bursts(begin_idx, end_idx, timestamps, merge_ns):
+    """
+    Merge the bursts separated by less than merge_ns.
+    :param begin_idx: index of the first event of each burst
+    :param end_idx: index of the last event of each burst
+    :param timestamps: time of the events in ns
+    :param merge_ns: bursts closer than that are merged
+    :return: begin_idx and end_idx of the merged bursts
+    """
+    timestamps = np.asarray(timestamps)
+    interval = timestamps[begin_idx[1:]] - timestamps[end_idx[:-1]]
+    starts_new_burst = np.concatenate(([True], interval >= merge_ns))
+    ends_burst = np.concatenate((starts_new_burst[1:], [True]))
+    return begin_idx[starts_new_burst], end_idx[ends_burst]
+
+
+def read_baselines(files, disable_bar=False):
+    """
+    Read the event ids, times and baselines averaged over the camera.
+    For ZFITs files, only the event headers and baselines are decoded.
+    :param files: list of input files
+    :param disable_bar: If set to true, the progress bar is not shown.
+    :return: event ids, timestamps (in ns) and mean baselines
+    """
+    if all(file.endswith('.fits.fz') for file in files):
+        headers = read_headers(files, baseline=True, disable_bar=disable_bar)
+        return headers['event_number'], headers['local_camera_clock'], \
+            headers['baseline_mean']
+    events = calibration_event_stream(files, disable_bar=disable_bar)
+    events = fill_digicam_baseline(events)
+    event_ids = []
+    timestamps = []
+    baselines = []
+    for event in events:
+        event_ids.append(event.event_id)
+        timestamps.append(event.data.local_time)
+        baselines.append(np.mean(event.data.digicam_baseline))
+    return np.array(event_ids), np.array(timestamps), np.array(baselines)
 
 
 def animate_baseline(events, video, event_id_min=None, event_id_max=None):
@@ -135,27 +189,13 @@ def get_burst(
         disable_bar=False
 ):
     # get events info
-    events = calibration_event_stream(files, disable_bar=disable_bar)
-    events = fill_digicam_baseline(events)
-    events = tag_burst_from_moving_average_baseline(
-        events, n_previous_events=n_previous_events,
+    event_ids, timestamps, baselines = read_baselines(
+        files, disable_bar=disable_bar
+    )
+    are_burst = tag_burst_from_baselines(
+        timestamps, baselines, n_previous_events=n_previous_events,
         threshold_lsb=threshold_lsb
     )
-    n_event = 0
-    timestamps = []
-    event_ids = []
-    are_burst = []
-    baselines = []
-    for event in events:
-        n_event += 1
-        timestamps.append(event.data.local_time)
-        event_ids.append(event.event_id)
-        are_burst.append(event.data.burst)
-        baselines.append(np.mean(event.data.digicam_baseline))
-    timestamps = np.array(timestamps)
-    event_ids = np.array(event_ids)
-    are_burst = np.array(are_burst)
-    baselines = np.array(baselines)
 
     # plot history of the baselines
     if plot_baseline is not None:
@@ -176,36 +216,12 @@ def get_burst(
     if np.all(~are_burst):
         raise SystemExit('no burst detected')
     are_burst = expand_mask(are_burst, iters=expand)
-    previous_is_burst = False
-    bursts = []
-    for event in range(n_event):
-        if are_burst[event]:
-            if not previous_is_burst:
-                bursts.append([event])
-            if event == n_event - 1 or (not are_burst[event + 1]):
-                bursts[-1].append(event)
-            previous_is_burst = True
-        else:
-            previous_is_burst = False
-    if np.all(~are_burst):
-        raise SystemExit('no burst identified')
+    begin_idx, end_idx = get_burst_intervals(are_burst)
 
     # merge bursts which are closer than merge_sec seconds
-    last_burst_begin = bursts[0][0]
-    last_burst_end = bursts[0][1]
-    merged_bursts = []
-    for burst_idxs in bursts[1:]:
-        begin_idx, end_idx = burst_idxs
-        interval = (timestamps[begin_idx] - timestamps[last_burst_end])
-        if interval < merge_sec * 1e9:
-            last_burst_end = end_idx
-        else:
-            merged_bursts.append([last_burst_begin, last_burst_end])
-            last_burst_begin = begin_idx
-            last_burst_end = end_idx
-    if len(merged_bursts) == 0 or merged_bursts[-1][0] != last_burst_begin:
-        merged_bursts.append([last_burst_begin, last_burst_end])
-    bursts = merged_bursts
+    begin_idx, end_idx = merge_bursts(begin_idx, end_idx, timestamps,
+                                      merge_sec * 1e9)
+    bursts = list(zip(begin_idx, end_idx))
 
     # output result
     if output is None:
@@ -227,7 +243,10 @@ def get_burst(
     if video_prefix is not None:
         for i, burst_idxs in enumerate(bursts):
             begin_idx, end_idx = burst_idxs
-            events = calibration_event_stream(files, disable_bar=disable_bar)
+            events = calibration_event_stream(
+                files, disable_bar=disable_bar,
+                event_id_range=(event_ids[begin_idx], event_ids[end_idx])
+            )
             events = fill_digicam_baseline(events)
             if video_prefix != "show":
                 video = video_prefix + "_" + str(i) + ".mp4"
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Add slow data columns to a table of events, f.e. the output of
+digicam-pipeline run with --skip_slow_data. The columns of digicam-pipeline
+computed from the slow data of the services given with --pipeline_fields are
+added (az, el, temperatures, ...), plus the slow data columns given with
+--columns. Only the services needed for these columns are read. Each event
+gets the values of the last slow data entry before its local_time. The
+events are read by chunks and the entries of each service are found with a
+single search per chunk.
+
+Usage:
+  digicam-join-slow-data [options] <INPUT> <OUTPUT>
+
+Options:
+  -h --help                 Show this screen.
+  <INPUT>                   Table of events (FITS or HDF5) with a local_time
+                            column in ns.
+  <OUTPUT>                  Output table, the events of INPUT with the slow
+                            data columns added.
+  --aux_basepath=DIR        Base directory for the auxilary data.
+  --columns=LIST            Comma separated list of the slow data columns to
+                            add, each given as SERVICE.COLUMN (f.e.
+                            DriveSystem.current_position_az).
+                            [Default: none]
+  --pipeline_fields=LIST    Comma separated list of the services for which
+                            the columns of digicam-pipeline are added (f.e.
+                            DriveSystem,SafetyPLC). If "all", the columns of
+                            all the services are added. If "none", only the
+                            columns given with --columns are added.
+                            [Default: all]
+  --chunk_size=N            Number of events processed at once.
+                            [Default: 10000]
+"""
+import os
+from collections import OrderedDict
+
+import numpy as np
+from docopt import docopt
+
+from digicampipe.io.auxservice import AuxService, SLOW_DATA_COLUMNS, \
+    SLOW_DATA_DERIVED
+from digicampipe.io.table_writer import TableWriter, read_schema, \
+    read_chunks
+from digicampipe.utils.docopt import convert_int, convert_text
+
+
+def join_slow_data(input_filename, output_filename, aux_basepath,
+                   columns=None, pipeline_fields=True, chunk_size=10000):
+    """
+    Write a copy of a table of events with the slow data values at the time
+    of each event.
+    :param input_filename: path to the table of events. It must have a
+    local_time column, in ns.
+    :param output_filename: path to the output table
+    :param aux_basepath: directory of the aux files
+    :param columns: dictionary of the list of columns to add for each
+    service. The output columns have the names of the slow data columns.
+    :param pipeline_fields: if True, the fields of digicam-pipeline computed
+    from the slow data (c.f. auxservice.SLOW_DATA_DERIVED) are added. It can
+    also be a list of services, to add only the fields of these services.
+    :param chunk_size: number of events processed at once
+    """
+    if os.path.abspath(input_filename) == os.path.abspath(output_filename):
+        raise ValueError('the output must differ from the input')
+    dtype, units, _ = read_schema(input_filename)
+    if columns is None:
+        columns = {}
+    if pipeline_fields is True:
+        pipeline_fields = SLOW_DATA_DERIVED.keys()
+    elif not pipeline_fields:
+        pipeline_fields = []
+    unknown_services = [
+        name for name in pipeline_fields if name not in SLOW_DATA_DERIVED
+    ]
+    if len(unknown_services) > 0:
+        raise ValueError('no fields of digicam-pipeline for services {}'
+                         .format(unknown_services))
+    derived = OrderedDict(
+        (name, SLOW_DATA_DERIVED[name]) for name in pipeline_fields
+    )
+    # output columns of each service
+    added_columns = OrderedDict()
+    for name in list(columns.keys()) + list(derived.keys()):
+        added_columns[name] = list(columns.get(name, [])) + \
+            list(derived.get(name, {}).keys())
+    services = OrderedDict()
+    for name in added_columns.keys():
+        needed_columns = list(columns.get(name, []))
+        if name in derived:
+            needed_columns += SLOW_DATA_COLUMNS[name]
+        services[name] = AuxService(name, aux_basepath,
+                                    columns=needed_columns,
+                                    derived=derived.get(name))
+    all_added_columns = [
+        column for service_columns in added_columns.values()
+        for column in service_columns
+    ]
+    duplicated_columns = [
+        column for column in set(all_added_columns)
+        if column in dtype.names or all_added_columns.count(column) > 1
+    ]
+    if len(duplicated_columns) > 0:
+        raise ValueError('columns {} would appear twice in the output'
+                         .format(duplicated_columns))
+    if os.path.isfile(output_filename):
+        print('WARNING:', output_filename, 'existed, overwriting it.')
+        os.remove(output_filename)
+    with TableWriter(output_filename, mode='w') as writer:
+        for chunk in read_chunks(input_filename, chunk_size=chunk_size):
+            slow_data = OrderedDict()
+            for name, service in services.items():
+                values = service.at_many(chunk['local_time'])
+                for column in added_columns[name]:
+                    slow_data[column] = getattr(values, column)
+            output_dtype = dtype.descr + [
+                (column, value.dtype, value.shape[1:])
+                for column, value in slow_data.items()
+            ]
+            rows = np.zeros(len(chunk), dtype=output_dtype)
+            for column in dtype.names:
+                rows[column] = chunk[column]
+            for column, value in slow_data.items():
+                rows[column] = value
+            writer.append_rows(rows, units=units)
+    print(writer.n_rows, 'events saved in', output_filename)
+
+
+def parse_columns(text):
+    """
+    :param text: comma separated list of SERVICE.COLUMN
+    :return: dictionary of the list of columns for each service
+    """
+    columns = OrderedDict()
+    for service_column in text.split(','):
+        service, column = service_column.strip().split('.')
+        columns.setdefault(service, []).append(column)
+    return columns
+
+
+def entry():
+    args = docopt(__doc__)
+    input_filename = args['<INPUT>']
+    output_filename = args['<OUTPUT>']
+    aux_basepath = args['--aux_basepath']
+    columns = convert_text(args['--columns'])
+    if columns is not None:
+        columns = parse_columns(columns)
+    pipeline_fields = convert_text(args['--pipeline_fields'])
+    if pipeline_fields is None:
+        pipeline_fields = False
+    elif pipeline_fields == 'all':
+        pipeline_fields = True
+    else:
+        pipeline_fields = [
+            name.strip() for name in pipeline_fields.split(',')
+        ]
+    chunk_size = convert_int(args['--chunk_size'])
+    join_slow_data(input_filename, output_filename, aux_basepath,
+                   columns=columns, pipeline_fields=pipeline_fields,
+                   chunk_size=chunk_size)
+
+
+if __name__ == '__main__':
+    entry()
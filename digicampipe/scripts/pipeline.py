@@ -14,8 +14,16 @@ Options:
                             from the input files.
                             [Default: search]
   --max_events=N            Maximum number of events to analyze
-  -o FILE --output=FILE     file where to store the results.
+  -o FILE --output=FILE     file where to store the results. It is a FITS
+                            table, or an HDF5 table if FILE ends with .h5 or
+                            .hdf5.
                             [Default: ./hillas.fits]
+  --append                  If used, the results are appended to the table in
+                            the output file if it exists instead of
+                            replacing it.
+  --buffer_size=N           Number of events written at once to the output
+                            file.
+                            [Default: 1000]
   --dark=FILE               File containing the Histogram of
                             the dark analysis
   -v --debug                Enter the debug mode.
@@ -39,14 +47,21 @@ Options:
   --template=FILE           Pulse template file path
   --disable_bar             If used, the progress bar is not show while
                             reading files.
+  --skip_slow_data          If used, the slow data are not read while
+                            processing the events and the output does not
+                            contain the columns computed from them. Use
+                            digicam-join-slow-data to add them afterwards.
+  --precision=TYPE          Floating point type of the calibrated waveforms
+                            and charges, "float32" or "float64".
+                            [Default: float32]
 """
 import os
+
 import astropy.units as u
 import numpy as np
 import yaml
 from ctapipe.core import Field
 from ctapipe.io.containers import HillasParametersContainer
-from ctapipe.io.serializer import Serializer
 from docopt import docopt
 import matplotlib.pyplot as plt
 from histogram.histogram import Histogram1D
@@ -55,15 +70,26 @@ from digicampipe.scripts.bad_pixels import get_bad_pixels
 from digicampipe.calib import baseline, peak, charge, cleaning, image, tagging
 from digicampipe.calib import filters
 from digicampipe.instrument.camera import DigiCam
+from digicampipe.io.auxservice import SLOW_DATA_COLUMNS, SLOW_DATA_DERIVED
 from digicampipe.io.event_stream import calibration_event_stream, \
     add_slow_data_calibration
+from digicampipe.io.table_writer import TableWriter
 from digicampipe.utils.docopt import convert_int, convert_list_int, \
     convert_text, convert_float
+from digicampipe.utils.precision import set_float_dtype
 from digicampipe.utils.pulse_template import NormalizedPulseTemplate
 from digicampipe.visualization.plot import plot_array_camera
 from digicampipe.image.hillas import compute_alpha, compute_miss
 
 
+# fields of PipelineOutputContainer computed from the slow data
+SLOW_DATA_FIELDS = [
+    'az', 'el', 'digicam_temperature', 'pdp_temperature', 'target_ra',
+    'target_dec', 'pointing_leds_on', 'pointing_leds_blink', 'all_hv_on',
+    'all_ghv_on', 'is_on_source', 'is_tracking',
+]
+
+
 class PipelineOutputContainer(HillasParametersContainer):
     # info on event
     local_time = Field(np.int64, 'Event time in nanoseconds since 1970')
@@ -94,12 +120,27 @@ class PipelineOutputContainer(HillasParametersContainer):
     saturated = Field(bool, 'Is any pixel signal saturated')
 
 
+def fill_slow_data(output, slow_data):
+    """
+    Fill the fields of PipelineOutputContainer computed from the slow data
+    (c.f. SLOW_DATA_FIELDS).
+    :param output: PipelineOutputContainer to fill
+    :param slow_data: slow data of the event, as set by
+    add_slow_data_calibration() with the quantities of SLOW_DATA_DERIVED.
+    """
+    for service, fields in SLOW_DATA_DERIVED.items():
+        row = getattr(slow_data, service)
+        for field in fields.keys():
+            output[field] = getattr(row, field)
+
+
 def main_pipeline(
         files, aux_basepath, max_events, dark_filename, integral_width,
         debug, hillas_filename, parameters_filename,
         picture_threshold, boundary_threshold, template_filename,
         saturation_threshold, threshold_pulse,
-        bad_pixels=None, disable_bar=False
+        bad_pixels=None, disable_bar=False, append=False, buffer_size=1000,
+        slow_data=True
 ):
     # get configuration
     with open(parameters_filename) as file:
@@ -126,11 +167,13 @@ def main_pipeline(
     # define pipeline
     events = calibration_event_stream(files, max_events=max_events,
                                       disable_bar=disable_bar)
-    events = add_slow_data_calibration(
-        events, basepath=aux_basepath,
-        aux_services=('DriveSystem', 'DigicamSlowControl', 'MasterSST1M',
-                      'SafetyPLC', 'PDPSlowControl')
-    )
+    if slow_data:
+        events = add_slow_data_calibration(
+            events, basepath=aux_basepath,
+            aux_services=tuple(SLOW_DATA_COLUMNS.keys()),
+            columns=SLOW_DATA_COLUMNS,
+            derived=SLOW_DATA_DERIVED,
+        )
     events = baseline.fill_dark_baseline(events, dark_baseline)
     events = baseline.fill_digicam_baseline(events)
     events = tagging.tag_burst_from_moving_average_baseline(events)
@@ -168,7 +211,8 @@ def main_pipeline(
         threshold_time=2.1 * u.ns, threshold_size=0.005 * u.mm
     )
     # create pipeline output file
-    output_file = Serializer(hillas_filename, mode='w', format='fits')
+    output_file = TableWriter(hillas_filename, mode='a' if append else 'w',
+                              buffer_size=buffer_size)
     data_to_store = PipelineOutputContainer()
     for event in events:
         if debug:
@@ -187,8 +231,6 @@ def main_pipeline(
         data_to_store.local_time = event.data.local_time
         data_to_store.event_type = event.event_type
         data_to_store.event_id = event.event_id
-        data_to_store.az = event.slow_data.DriveSystem.current_position_az
-        data_to_store.el = event.slow_data.DriveSystem.current_position_el
 
         r = event.hillas.r
         phi = event.hillas.phi
@@ -199,62 +241,23 @@ def main_pipeline(
         data_to_store.miss = data_to_store.miss * r.unit
         data_to_store.baseline = np.mean(event.data.digicam_baseline)
         data_to_store.nsb_rate = np.mean(event.data.nsb_rate)
-        temp_crate1 = event.slow_data.DigicamSlowControl.Crate1_T
-        temp_crate2 = event.slow_data.DigicamSlowControl.Crate2_T
-        temp_crate3 = event.slow_data.DigicamSlowControl.Crate3_T
-        temp_digicam = np.array(
-            np.hstack([temp_crate1, temp_crate2, temp_crate3])
-        )
-        temp_digicam_mean = np.mean(
-            temp_digicam[np.logical_and(temp_digicam > 0, temp_digicam < 60)]
-        )
-        data_to_store.digicam_temperature = temp_digicam_mean
-        temp_sector1 = event.slow_data.PDPSlowControl.Sector1_T
-        temp_sector2 = event.slow_data.PDPSlowControl.Sector2_T
-        temp_sector3 = event.slow_data.PDPSlowControl.Sector3_T
-        temp_pdp = np.array(
-            np.hstack([temp_sector1, temp_sector2, temp_sector3])
-        )
-        temp_pdp_mean = np.mean(
-            temp_pdp[np.logical_and(temp_pdp > 0, temp_pdp < 60)]
-        )
-        data_to_store.pdp_temperature = temp_pdp_mean
-        target_radec = event.slow_data.MasterSST1M.target_radec
-        data_to_store.target_ra = target_radec[0]
-        data_to_store.target_dec = target_radec[1]
-        status_leds = event.slow_data.SafetyPLC.SPLC_CAM_Status
-        # bit 8 of status_LEDs is about on/off, bit 9 about blinking
-        data_to_store.pointing_leds_on = bool((status_leds & 1 << 8) >> 8)
-        data_to_store.pointing_leds_blink = bool((status_leds & 1 << 9) >> 9)
-        hv_sector1 = event.slow_data.PDPSlowControl.Sector1_HV
-        hv_sector2 = event.slow_data.PDPSlowControl.Sector2_HV
-        hv_sector3 = event.slow_data.PDPSlowControl.Sector3_HV
-        hv_pdp = np.array(
-            np.hstack([hv_sector1, hv_sector2, hv_sector3]), dtype=bool
-        )
-        data_to_store.all_hv_on = np.all(hv_pdp)
-        ghv_sector1 = event.slow_data.PDPSlowControl.Sector1_GHV
-        ghv_sector2 = event.slow_data.PDPSlowControl.Sector2_GHV
-        ghv_sector3 = event.slow_data.PDPSlowControl.Sector3_GHV
-        ghv_pdp = np.array(
-            np.hstack([ghv_sector1, ghv_sector2, ghv_sector3]), dtype=bool
-        )
-        data_to_store.all_ghv_on = np.all(ghv_pdp)
-        is_on_source = bool(event.slow_data.DriveSystem.is_on_source)
-        data_to_store.is_on_source = is_on_source
-        is_tracking = bool(event.slow_data.DriveSystem.is_tracking)
-        data_to_store.is_tracking = is_tracking
+        if slow_data:
+            fill_slow_data(data_to_store, event.slow_data)
         data_to_store.shower = bool(event.data.shower)
         data_to_store.border = bool(event.data.border)
         data_to_store.burst = bool(event.data.burst)
         data_to_store.saturated = bool(event.data.saturated)
         for key, val in event.hillas.items():
             data_to_store[key] = val
-        output_file.add_container(data_to_store)
-    try:
-        output_file.close()
-        print(hillas_filename, 'created.')
-    except ValueError:
+        row = dict(data_to_store.items())
+        if not slow_data:
+            for key in SLOW_DATA_FIELDS:
+                del row[key]
+        output_file.append(row)
+    output_file.close()
+    if output_file.n_rows > 0:
+        print(output_file.n_rows, 'events saved in', hillas_filename)
+    else:
         print('WARNING: no data to save,', hillas_filename, 'not created.')
 
 
@@ -279,8 +282,12 @@ def entry():
     disable_bar = args['--disable_bar']
     saturation_threshold = convert_float(args['--saturation_threshold'])
     threshold_pulse = convert_float(args['--threshold_pulse'])
+    append = args['--append']
+    buffer_size = convert_int(args['--buffer_size'])
+    slow_data = not args['--skip_slow_data']
+    set_float_dtype(convert_text(args['--precision']))
 
-    if aux_basepath.lower() == "search":
+    if slow_data and aux_basepath.lower() == "search":
         input_dir = np.unique([os.path.dirname(file) for file in files])
         if len(input_dir) > 1:
             raise AttributeError(
@@ -313,6 +320,9 @@ def entry():
         disable_bar=disable_bar,
         threshold_pulse=threshold_pulse,
         saturation_threshold=saturation_threshold,
+        append=append,
+        buffer_size=buffer_size,
+        slow_data=slow_data,
     )
 
 
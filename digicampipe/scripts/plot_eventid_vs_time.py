@@ -23,34 +23,22 @@ import numpy as np
 import os
 from pandas import to_datetime
 
-from digicampipe.io.event_stream import event_stream
-from digicampipe.utils.docopt import convert_text
+from digicampipe.io.zfits import read_headers
+from digicampipe.utils.docopt import convert_text, convert_int
 
 
 def entry(files, event_id_start, event_id_end, plot):
-    events = event_stream(
-        files,
-        event_id_range=(int(event_id_start), int(event_id_end))
-    )
-    events_id = []
-    events_ts = []
-    baselines_mean = []
-    for i, event in enumerate(events):
-        tel = event.r0.tels_with_data[0]
-        clock_ns = event.r0.tel[tel].local_camera_clock
-        event_id = event.r0.tel[tel].camera_event_number
-        baseline_mean = np.mean(event.r0.tel[tel].digicam_baseline)
-        events_ts.append(clock_ns)
-        events_id.append(event_id)
-        baselines_mean.append(baseline_mean)
-    events_ts = np.array(events_ts)
-    events_id = np.array(events_id)
-    baselines_mean = np.array(baselines_mean)
+    # only the events in the range are read, using the event index
+    headers = read_headers(files, baseline=True,
+                           event_id_range=(event_id_start, event_id_end))
+    events_ts = headers['local_camera_clock']
+    events_id = headers['event_number']
+    baselines_mean = headers['baseline_mean']
     order = np.argsort(events_ts)
     events_ts = events_ts[order]
     events_id = events_id[order]
     baselines_mean = baselines_mean[order]
-    if plot.lower() is not None:
+    if plot is not None:
         print('plotted with respect to t=', to_datetime(events_ts[0]))
         fig1 = plt.figure(figsize=(8, 8))
         plt.subplot(2, 2, 1)
@@ -81,7 +69,7 @@ def entry(files, event_id_start, event_id_end, plot):
 if __name__ == '__main__':
     args = docopt(__doc__)
     files = args['<INPUT>']
-    event_id_start = args['--event_id_start']
-    event_id_end = args['--event_id_end']
+    event_id_start = convert_int(args['--event_id_start'])
+    event_id_end = convert_int(args['--event_id_end'])
     plot = convert_text(args['--plot'])
     entry(files, event_id_start, event_id_end, plot)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Convert the zfits files of a run to an uncompressed R0 cache. The cache can
+then be given as input to the other scripts instead of the zfits files,
+avoiding to decompress them at each pass.
+
+Usage:
+  digicam-r0-cache [options] <OUTPUT> <INPUTS>...
+
+Options:
+  -h --help                   Show this screen.
+  --max_events=N              Maximum number of events to write.
+                              [Default: none]
+  --batch_size=N              Number of events decoded at once.
+                              [Default: 1000]
+  --pixel_major               If used, the samples are also stored pixel
+                              after pixel, such that jobs analysing a subset
+                              of pixels (--pixel option of the calibration
+                              scripts) only read the samples of these pixels.
+  --disable_bar               If used, the progress bar is not show while
+                              reading files.
+"""
+from docopt import docopt
+
+from digicampipe.io.r0cache import write_r0_cache
+from digicampipe.utils.docopt import convert_int
+
+
+def entry():
+    args = docopt(__doc__)
+    output = args['<OUTPUT>']
+    inputs = args['<INPUTS>']
+    max_events = convert_int(args['--max_events'])
+    batch_size = convert_int(args['--batch_size'])
+    pixel_major = args['--pixel_major']
+    disable_bar = args['--disable_bar']
+    write_r0_cache(inputs, output, max_events=max_events,
+                   batch_size=batch_size, pixel_major=pixel_major,
+                   disable_bar=disable_bar)
+
+
+if __name__ == '__main__':
+    entry()
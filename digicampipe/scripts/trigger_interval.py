@@ -20,7 +20,7 @@ from docopt import docopt
 import numpy as np
 import matplotlib.pyplot as plt
 from histogram.histogram import Histogram1D
-from digicampipe.io.event_stream import calibration_event_stream
+from digicampipe.io.zfits import read_headers
 from digicampipe.utils.docopt import convert_max_events_args
 
 
@@ -29,20 +29,19 @@ def compute(files, max_events, filename):
         dt_histo = Histogram1D.load(filename)
         return dt_histo
     else:
-        events = calibration_event_stream(files, max_events=max_events)
+        headers = read_headers(files, max_events=max_events)
         dt_histo = Histogram1D(
             data_shape=(9,),
             bin_edges=np.logspace(2, 9, 140),  # in ns
             # bin_edges=np.arange(150, 400, 4),  # in ns
         )
-        previous_time = np.zeros(9) * np.nan
-        for event in events:
-            typ = event.event_type
-            local_time = event.data.local_time  # in ns
-            dt = local_time - previous_time[typ]  # in ns
-            if np.isfinite(previous_time[typ]):
-                dt_histo.fill(dt, indices=(event.event_type,))
-            previous_time[typ] = local_time
+        for typ in range(9):
+            is_type = headers['camera_event_type'] == typ
+            local_time = headers['local_camera_clock'][is_type]  # in ns
+            if len(local_time) < 2:
+                continue
+            dt = np.diff(local_time)  # in ns
+            dt_histo.fill(dt, indices=(typ,))
         dt_histo.save(filename)
         print(filename, 'saved')
         return dt_histo
@@ -0,0 +1,8 @@
+import os
+
+# The tests must not write the aux data cache (c.f.
+# digicampipe.io.auxservice.AUX_CACHE_DIR) into the home directory of the
+# user. This is read when digicampipe.io.auxservice is imported, which
+# happens after this file is loaded. The tests of the cache give their own
+# cache_dir.
+os.environ['DIGICAMPIPE_AUX_CACHE'] = 'none'
@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+import numpy as np
+from astropy.table import Table
+
+from digicampipe.scripts.concatenate import entry
+
+
+def test_concatenate():
+    table_1 = Table({
+        'event_id': np.arange(5, dtype=np.int32),
+        'burst': np.arange(5) % 2 == 0,
+    })
+    table_2 = Table({
+        'event_id': np.arange(5, 8, dtype=np.int64),
+        'burst': np.zeros(3, dtype=bool),
+    })
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        inputs = [os.path.join(tmpdirname, name)
+                  for name in ['1.fits', '2.fits']]
+        table_1.write(inputs[0])
+        table_2.write(inputs[1])
+        output = os.path.join(tmpdirname, 'output.fits')
+        entry(inputs, output, chunk_size=2)
+        result = Table.read(output)
+        np.testing.assert_array_equal(result['event_id'], np.arange(8))
+        assert result['event_id'].dtype.kind == 'i'
+        assert result['event_id'].dtype.itemsize == 8
+        assert result['burst'].dtype == bool
+        np.testing.assert_array_equal(
+            result['burst'], np.hstack((table_1['burst'], table_2['burst']))
+        )
@@ -3,7 +3,8 @@ import numpy as np
 import pkg_resources
 
 from digicampipe.io.event_stream import event_stream
-from digicampipe.io.hdf5 import digicamtoy_event_source
+from digicampipe.io.hdf5 import digicamtoy_event_source, \
+    digicamtoy_batch_source
 
 example_file_path = pkg_resources.resource_filename(
     'digicampipe',
@@ -72,3 +73,36 @@ def test_baseline():
 
             baseline = event.r0.tel[tel_id].digicam_baseline
             np.testing.assert_array_equal(baseline, EXPECTED_BASELINE)
+
+
+def test_event_id():
+    events = digicamtoy_event_source(example_file_path_2, event_id=2,
+                                     max_events=3)
+    event_ids = [event.r0.tel[TEL_WITH_DATA].camera_event_number
+                 for event in events]
+    assert event_ids == [2, 3, 4]
+    events = digicamtoy_event_source(example_file_path_2,
+                                     event_id_range=(2, 4))
+    event_ids = [event.r0.tel[TEL_WITH_DATA].camera_event_number
+                 for event in events]
+    assert event_ids == [3, 4]
+
+
+def test_batch_source_and_buffers():
+    adc_samples = [
+        event.r0.tel[TEL_WITH_DATA].adc_samples.copy()
+        for event in digicamtoy_event_source(example_file_path_2)
+    ]
+    batches = digicamtoy_batch_source(example_file_path_2, batch_size=2,
+                                      max_events=5)
+    np.testing.assert_array_equal(
+        np.concatenate([batch.adc_samples for batch in batches]),
+        adc_samples
+    )
+    events = digicamtoy_event_source(example_file_path_2, max_events=5,
+                                     chunk_size=2, prefetch=1,
+                                     reuse_buffers=True)
+    for event, expected in zip(events, adc_samples):
+        np.testing.assert_array_equal(
+            event.r0.tel[TEL_WITH_DATA].adc_samples, expected
+        )
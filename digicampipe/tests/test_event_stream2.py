@@ -1,8 +1,13 @@
 import os
+import shutil
+import tempfile
 
+import numpy as np
 import pkg_resources
+import pytest
 
-from digicampipe.io.event_stream import event_stream
+from digicampipe.io.event_stream import event_stream, \
+    calibration_event_stream
 
 example_file_path = pkg_resources.resource_filename(
     'digicampipe',
@@ -37,3 +42,61 @@ def test_check_speed_of_protozfits_again(benchmark):
             pass
 
         assert i == 99
+
+
+def test_event_stream_parallel():
+    files = [example_file_path] * 3
+    expected = [
+        (event.r0.tel[1].camera_event_number, event.r0.tel[1].adc_samples)
+        for event in event_stream(files)
+    ]
+    events = event_stream(files, n_workers=2)
+    n_events = 0
+    for event, (event_number, adc_samples) in zip(events, expected):
+        r0 = event.r0.tel[1]
+        assert r0.camera_event_number == event_number
+        np.testing.assert_array_equal(r0.adc_samples, adc_samples)
+        n_events += 1
+    assert n_events == len(expected)
+
+
+def test_event_stream_parallel_ranges():
+    expected = [
+        event.r0.tel[1].camera_event_number
+        for event in event_stream(example_file_path)
+    ]
+    event_id_range = (expected[10], expected[30])
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        # the event index is saved next to the file
+        file = os.path.join(tmpdirname, 'example.fits.fz')
+        shutil.copy(example_file_path, file)
+        event_numbers = [
+            event.r0.tel[1].camera_event_number
+            for event in event_stream([file] * 2, n_workers=2, batch_size=7,
+                                      event_id_range=event_id_range,
+                                      max_events=25)
+        ]
+        assert event_numbers == expected[11:31] + expected[11:16]
+        with pytest.raises(ValueError):
+            for _ in event_stream([file] * 2, n_workers=2, prefetch=2):
+                pass
+
+
+def test_calibration_event_stream_pixel_selection():
+    expected = [
+        (event.r0.tel[1].adc_samples, event.r0.tel[1].digicam_baseline)
+        for event in event_stream(example_file_path, max_events=10)
+    ]
+    for pixel_id in [[...], list(range(100, 200)), [12, 5, 700]]:
+        events = calibration_event_stream(example_file_path,
+                                          pixel_id=pixel_id, max_events=10)
+        for event, (adc_samples, baseline) in zip(events, expected):
+            if pixel_id != [...]:
+                adc_samples = adc_samples[pixel_id]
+                baseline = baseline[pixel_id]
+            np.testing.assert_array_equal(event.data.adc_samples, adc_samples)
+            np.testing.assert_array_equal(event.data.digicam_baseline,
+                                          baseline)
+            assert len(event.pixel_id) == len(adc_samples)
+            assert np.all(event.data.cleaning_mask)
+            event.data.cleaning_mask[:] = False
@@ -1,10 +1,14 @@
 import os
 import tempfile
+from types import SimpleNamespace
 
 import numpy as np
 from pkg_resources import resource_filename
 
-from digicampipe.scripts.get_burst import get_burst
+from digicampipe.calib.tagging import tag_burst_from_baselines, \
+    tag_burst_from_moving_average_baseline
+from digicampipe.scripts.get_burst import get_burst, expand_mask, \
+    get_burst_intervals, merge_bursts
 
 
 example_file2_path = resource_filename(
@@ -51,5 +55,50 @@ def test_get_burst():
         assert os.path.isfile(output2)
 
 
+def test_tag_burst_from_baselines():
+    n_event = 2000
+    timestamps = np.cumsum(np.random.randint(1e6, 1e9, size=n_event))
+    timestamps[500:] += int(60e9)  # gap resetting the moving average
+    baselines = np.random.normal(300, 1, size=n_event)
+    baselines[1000:1050] += 10
+    events = [
+        SimpleNamespace(data=SimpleNamespace(
+            baseline=np.array([baseline]), local_time=timestamp
+        ))
+        for timestamp, baseline in zip(timestamps, baselines)
+    ]
+    events = tag_burst_from_moving_average_baseline(
+        events, n_previous_events=100, threshold_lsb=2
+    )
+    are_burst_stream = [event.data.burst for event in events]
+    are_burst = tag_burst_from_baselines(
+        timestamps, baselines, n_previous_events=100, threshold_lsb=2
+    )
+    np.testing.assert_array_equal(are_burst, are_burst_stream)
+    assert np.all(are_burst[1000:1020])
+
+
+def test_expand_mask():
+    mask = np.zeros(30, dtype=bool)
+    mask[[0, 10, 11, 20]] = True
+    expected = np.zeros(30, dtype=bool)
+    expected[0:4] = True
+    expected[7:15] = True
+    expected[17:24] = True
+    np.testing.assert_array_equal(expand_mask(mask, iters=3), expected)
+    np.testing.assert_array_equal(expand_mask(mask, iters=0), mask)
+
+
+def test_merge_bursts():
+    are_burst = np.array([1, 1, 0, 0, 1, 0, 0, 0, 1, 1], dtype=bool)
+    begin_idx, end_idx = get_burst_intervals(are_burst)
+    np.testing.assert_array_equal(begin_idx, [0, 4, 8])
+    np.testing.assert_array_equal(end_idx, [1, 4, 9])
+    timestamps = np.array([0, 1, 2, 3, 4, 5, 6, 7, 20, 21]) * 1e9
+    begin_idx, end_idx = merge_bursts(begin_idx, end_idx, timestamps, 5e9)
+    np.testing.assert_array_equal(begin_idx, [0, 8])
+    np.testing.assert_array_equal(end_idx, [4, 9])
+
+
 if __name__ == '__main__':
     test_get_burst()
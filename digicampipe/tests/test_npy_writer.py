@@ -0,0 +1,19 @@
+import os
+import tempfile
+
+import numpy as np
+
+from digicampipe.io.npy_writer import NpyWriter
+
+
+def test_npy_writer():
+    rows = np.random.uniform(size=(253, 1297))
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        filename = os.path.join(tmpdirname, 'images.npy')
+        with NpyWriter(filename, row_shape=(1297, ), buffer_size=10) as writer:
+            for row in rows:
+                writer.append(row)
+        loaded = np.load(filename, mmap_mode='r')
+        assert loaded.shape == rows.shape
+        np.testing.assert_array_equal(loaded, rows)
+        del loaded
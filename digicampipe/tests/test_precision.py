@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pytest
+
+from digicampipe.calib.baseline import fill_digicam_baseline, \
+    subtract_baseline
+from digicampipe.calib.charge import compute_charge, \
+    compute_sample_photo_electron
+from digicampipe.calib.peak import find_pulse_with_max
+from digicampipe.io.containers import CalibrationContainer
+from digicampipe.utils.precision import get_float_dtype, set_float_dtype, \
+    FLOAT32_RTOL, FLOAT32_ATOL
+
+n_pixels = 1296
+n_samples = 50
+n_events = 10
+
+
+def _make_dummy_stream(seed=0):
+    random_state = np.random.RandomState(seed)
+    event = CalibrationContainer()
+    for i in range(n_events):
+        # the DigiCam baseline is given in 1/16 of LSB
+        baseline = random_state.randint(200 * 16, 400 * 16, n_pixels) / 16
+        adc_samples = random_state.normal(
+            baseline[:, None], 5, size=(n_pixels, n_samples)
+        )
+        adc_samples[:, 20:25] += random_state.uniform(
+            0, 3000, size=(n_pixels, 1)
+        )
+        event.data.adc_samples = np.round(adc_samples).astype(np.int16)
+        event.data.digicam_baseline = baseline
+        event.data.gain_drop = random_state.uniform(0.8, 1, n_pixels)
+        yield event
+
+
+def _calibrate(precision):
+    old_dtype = get_float_dtype()
+    set_float_dtype(precision)
+    try:
+        events = _make_dummy_stream()
+        events = fill_digicam_baseline(events)
+        events = subtract_baseline(events)
+        events = find_pulse_with_max(events)
+        events = compute_charge(events, integral_width=7, shift=3)
+        events = compute_sample_photo_electron(
+            events, gain_amplitude=np.full(n_pixels, 5.)
+        )
+        results = []
+        for event in events:
+            results.append((
+                event.data.adc_samples.copy(),
+                event.data.reconstructed_charge.copy(),
+                event.data.sample_pe.copy(),
+            ))
+    finally:
+        set_float_dtype(old_dtype)
+    return results
+
+
+def test_float32_results():
+    for event_results in _calibrate('float32'):
+        for result in event_results:
+            assert result.dtype == np.float32
+
+
+def test_float32_equivalent_to_float64():
+    """
+    The results of the calibration in float32 must not differ from the ones
+    in float64 by more than FLOAT32_RTOL (relative) and FLOAT32_ATOL
+    (absolute).
+    """
+    results_32 = _calibrate('float32')
+    results_64 = _calibrate('float64')
+    assert len(results_32) == len(results_64) == n_events
+    for event_results_32, event_results_64 in zip(results_32, results_64):
+        for result_32, result_64 in zip(event_results_32, event_results_64):
+            assert result_64.dtype == np.float64
+            np.testing.assert_allclose(result_32, result_64,
+                                       rtol=FLOAT32_RTOL, atol=FLOAT32_ATOL)
+
+
+def test_set_float_dtype():
+    old_dtype = get_float_dtype()
+    try:
+        set_float_dtype('float64')
+        assert get_float_dtype() == np.float64
+        set_float_dtype(np.float32)
+        assert get_float_dtype() == np.float32
+        with pytest.raises(ValueError):
+            set_float_dtype('float16')
+    finally:
+        set_float_dtype(old_dtype)
+
+
+def test_default_float_dtype():
+    # float32 is only used when asked for, f.e. by digicam-pipeline
+    if 'DIGICAMPIPE_FLOAT_PRECISION' not in os.environ:
+        assert get_float_dtype() == np.float64
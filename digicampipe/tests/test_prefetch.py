@@ -0,0 +1,35 @@
+import threading
+
+import pytest
+
+from digicampipe.io.prefetch import read_ahead
+
+
+def _numbers(n, error_at=None):
+    for i in range(n):
+        if i == error_at:
+            raise ValueError('error at {}'.format(i))
+        yield i
+
+
+def test_read_ahead_order():
+    for depth in [0, 1, 5, 200]:
+        assert list(read_ahead(_numbers(100), depth)) == list(range(100))
+
+
+def test_read_ahead_exception():
+    values = []
+    with pytest.raises(ValueError):
+        for value in read_ahead(_numbers(100, error_at=50), 10):
+            values.append(value)
+    assert values == list(range(50))
+
+
+def test_read_ahead_early_stop():
+    n_threads = threading.active_count()
+    items = read_ahead(_numbers(1000), 3)
+    for value in items:
+        if value == 10:
+            break
+    items.close()
+    assert threading.active_count() == n_threads
@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+import numpy as np
+import pkg_resources
+
+from digicampipe.io.event_stream import event_stream, \
+    calibration_event_stream, guess_source_from_path
+from digicampipe.io.r0cache import write_r0_cache, r0_cache_event_source
+
+example_file_path = pkg_resources.resource_filename(
+    'digicampipe',
+    os.path.join(
+        'tests',
+        'resources',
+        'example_100_evts.000.fits.fz'
+    )
+)
+
+
+def test_r0_cache():
+    tel_id = 1
+    files = [example_file_path] * 2
+    expected = []
+    for data in event_stream(files):
+        r0 = data.r0.tel[tel_id]
+        expected.append((r0.camera_event_number, r0.local_camera_clock,
+                         r0.adc_samples, r0.digicam_baseline))
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        cache = os.path.join(tmpdirname, 'example.r0cache')
+        write_r0_cache(files, cache, batch_size=30)
+        assert guess_source_from_path(cache) is r0_cache_event_source
+        n_events = 0
+        for data, values in zip(event_stream(cache), expected):
+            r0 = data.r0.tel[tel_id]
+            assert r0.camera_event_number == values[0]
+            assert r0.local_camera_clock == values[1]
+            np.testing.assert_array_equal(r0.adc_samples, values[2])
+            np.testing.assert_array_equal(r0.digicam_baseline, values[3])
+            n_events += 1
+        assert n_events == len(expected)
+
+
+def test_r0_cache_pixel_major():
+    pixel_id = [600, 3, 4, 1000]
+    expected = [
+        (event.data.adc_samples.copy(), event.data.digicam_baseline.copy())
+        for event in calibration_event_stream(example_file_path,
+                                              pixel_id=pixel_id)
+    ]
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        cache = os.path.join(tmpdirname, 'example.r0cache')
+        write_r0_cache(example_file_path, cache, batch_size=30,
+                       pixel_major=True)
+        events = calibration_event_stream(cache, pixel_id=pixel_id)
+        n_events = 0
+        for event, (adc_samples, baseline) in zip(events, expected):
+            np.testing.assert_array_equal(event.pixel_id, pixel_id)
+            np.testing.assert_array_equal(event.data.adc_samples, adc_samples)
+            np.testing.assert_array_equal(event.data.digicam_baseline,
+                                          baseline)
+            n_events += 1
+        assert n_events == len(expected)
@@ -0,0 +1,49 @@
+import numpy as np
+
+from digicampipe.utils.ring_buffer import RingBuffer, RollingStatistics
+
+
+def test_ring_buffer():
+    n_items = 5
+    ring = RingBuffer(n_items, shape=(3, ))
+    assert len(ring) == 0
+    items = np.arange(12 * 3).reshape(12, 3)
+    for i, item in enumerate(items):
+        ring.append(item)
+        n_filled = min(i + 1, n_items)
+        assert len(ring) == n_filled
+        assert ring.is_full() == (n_filled == n_items)
+        np.testing.assert_array_equal(ring.last(),
+                                      items[i + 1 - n_filled:i + 1])
+        np.testing.assert_array_equal(ring.last(2), items[max(i - 1, 0):i + 1])
+        np.testing.assert_array_almost_equal(
+            ring.mean(), np.mean(items[i + 1 - n_filled:i + 1], axis=0)
+        )
+    ring.clear()
+    assert len(ring) == 0
+    ring.next_slot()[:] = 1
+    np.testing.assert_array_equal(ring.last(), [[1, 1, 1]])
+
+
+def test_ring_buffer_scalar():
+    ring = RingBuffer(3)
+    for value in range(10):
+        ring.append(value)
+    assert ring.mean() == 8
+    np.testing.assert_array_equal(ring.last(), [7, 8, 9])
+
+
+def test_rolling_statistics():
+    n_items = 7
+    statistics = RollingStatistics(n_items, shape=(10, ))
+    assert np.all(np.isnan(statistics.mean()))
+    items = np.random.normal(300, 5, size=(50, 10))
+    for i, item in enumerate(items):
+        statistics.append(item)
+        window = items[max(i + 1 - n_items, 0):i + 1]
+        assert len(statistics) == len(window)
+        np.testing.assert_allclose(statistics.mean(), np.mean(window, axis=0))
+        np.testing.assert_allclose(statistics.std(), np.std(window, axis=0))
+    statistics.clear()
+    statistics.append(items[0])
+    np.testing.assert_allclose(statistics.mean(), items[0])
@@ -1,9 +1,12 @@
 import os
+import shutil
+import tempfile
 from astropy import units as u
 import pkg_resources
 
 from digicampipe.io.hessio import hessio_get_list_event_ids
-from digicampipe.io.hessio import hessio_event_source
+from digicampipe.io.hessio import hessio_event_source, get_hessio_index
+from digicampipe.io.index import get_index_path
 from digicampipe.io.event_stream import event_stream, calibration_event_stream
 
 example_file_path = pkg_resources.resource_filename(
@@ -53,6 +56,33 @@ def test_event_id():
     assert energy == ENERGY
 
 
+def test_event_id_with_index():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        file = os.path.join(tmpdirname, 'example.simtel.gz')
+        shutil.copy(example_file_path, file)
+        index = get_hessio_index(file)
+        assert os.path.isfile(get_index_path(file))
+        assert list(index['event_number']) == [EVENT_ID]
+        assert hessio_get_list_event_ids(file) == [EVENT_ID]
+        for data in hessio_event_source(file, event_id=EVENT_ID):
+            event_id = data.r0.event_id
+            break
+        assert event_id == EVENT_ID
+        events = hessio_event_source(file, requested_event=EVENT_ID,
+                                     use_event_id=True)
+        assert [data.r0.event_id for data in events] == [EVENT_ID]
+
+
+def test_mc_fields():
+    for data in hessio_event_source(example_file_path, mc_fields=['energy']):
+        energy = data.mc.energy
+        tel_id = data.r0.tels_with_data[0]
+        mc_meta = data.mc.tel[tel_id].meta
+        break
+    assert energy == ENERGY
+    assert 'refstep' not in mc_meta
+
+
 def test_event_stream():
     events = event_stream([example_file_path])
     for event in events:
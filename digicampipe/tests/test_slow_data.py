@@ -1,8 +1,13 @@
 import os
+import tempfile
 import warnings
+from datetime import date
 import numpy as np
+from astropy.table import Table
 from pkg_resources import resource_filename
 
+from digicampipe.io.auxservice import AuxService, _load_combined_table
+from digicampipe.scripts.join_slow_data import join_slow_data
 from digicampipe.io.event_stream import event_stream, add_slow_data, \
     calibration_event_stream, add_slow_data_calibration
 
@@ -73,6 +78,87 @@ def test_add_slow_data_calibration():
     assert (diff <= 1.1).all()
 
 
+def test_aux_service_at_many():
+    service = AuxService('DriveSystem', aux_basepath, cache_dir=None)
+    data_stream = calibration_event_stream(example_file_path, max_events=100)
+    timestamps = [event.data.local_time for event in data_stream]
+    rows = service.at_many(timestamps)
+    for i, timestamp in enumerate(timestamps):
+        row = service.at(timestamp)
+        for name, value in row._asdict().items():
+            np.testing.assert_array_equal(getattr(rows, name)[i], value)
+
+
+def test_aux_service_disk_cache():
+    day = date(2018, 9, 1)
+    reference = AuxService('DriveSystem', aux_basepath, cache_dir=None)
+    reference = reference.at_date(day)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        service = AuxService('DriveSystem', aux_basepath, cache_dir=tmpdirname)
+        service.at_date(day)
+        assert len(os.listdir(tmpdirname)) == 1
+        _load_combined_table.cache_clear()
+        service = AuxService('DriveSystem', aux_basepath, cache_dir=tmpdirname)
+        cached = service.at_date(day)
+    assert cached.colnames == reference.colnames
+    for name in reference.colnames:
+        np.testing.assert_array_equal(cached[name], reference[name])
+
+
+def test_aux_service_columns():
+    columns = ['current_position_az', 'current_position_el']
+    service = AuxService('DriveSystem', aux_basepath, cache_dir=None,
+                         columns=columns)
+    reference = AuxService('DriveSystem', aux_basepath, cache_dir=None)
+    data_stream = calibration_event_stream(example_file_path, max_events=10)
+    for event in data_stream:
+        row = service.at(event.data.local_time)
+        reference_row = reference.at(event.data.local_time)
+        assert row._fields == tuple(['timestamp'] + columns)
+        for name in row._fields:
+            assert getattr(row, name) == getattr(reference_row, name)
+
+
+def test_join_slow_data():
+    data_stream = calibration_event_stream(example_file_path, max_events=100)
+    local_time = [event.data.local_time for event in data_stream]
+    columns = {'DriveSystem': ['current_position_az', 'current_position_el']}
+    service = AuxService('DriveSystem', aux_basepath, cache_dir=None)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        input_filename = os.path.join(tmpdirname, 'hillas.fits')
+        output_filename = os.path.join(tmpdirname, 'hillas_slow_data.fits')
+        Table({'local_time': local_time}).write(input_filename)
+        join_slow_data(input_filename, output_filename, aux_basepath,
+                       columns=columns, chunk_size=30)
+        output = Table.read(output_filename)
+    np.testing.assert_array_equal(output['local_time'], local_time)
+    for i, time in enumerate(local_time):
+        row = service.at(time)
+        for column in columns['DriveSystem']:
+            assert output[column][i] == getattr(row, column)
+        assert output['az'][i] == row.current_position_az
+
+
+def test_join_slow_data_services():
+    data_stream = calibration_event_stream(example_file_path, max_events=100)
+    local_time = [event.data.local_time for event in data_stream]
+    columns = {'SafetyPLC': ['SPLC_CAM_Status']}
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        input_filename = os.path.join(tmpdirname, 'hillas.fits')
+        output_filename = os.path.join(tmpdirname, 'hillas_slow_data.fits')
+        Table({'local_time': local_time}).write(input_filename)
+        join_slow_data(input_filename, output_filename, aux_basepath,
+                       pipeline_fields=['DriveSystem'])
+        output = Table.read(output_filename)
+        assert output.colnames == [
+            'local_time', 'az', 'el', 'is_on_source', 'is_tracking'
+        ]
+        join_slow_data(input_filename, output_filename, aux_basepath,
+                       columns=columns, pipeline_fields=False)
+        output = Table.read(output_filename)
+        assert output.colnames == ['local_time', 'SPLC_CAM_Status']
+
+
 if __name__ == '__main__':
     test_add_slow_data_calibration()
     test_add_slow_data()
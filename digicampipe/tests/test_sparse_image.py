@@ -0,0 +1,47 @@
+import os
+import tempfile
+
+import numpy as np
+
+from digicampipe.io.sparse_image import SparseImageWriter, SparseImages
+from digicampipe.utils.events_image import load_image
+
+
+def test_sparse_image():
+    images = np.random.uniform(size=(253, 1296)).astype(np.float32)
+    images[images < 0.9] = 0
+    images[10] = 0
+    event_ids = np.arange(len(images)) + 100
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        filename = os.path.join(tmpdirname, 'images.h5')
+        with SparseImageWriter(filename, n_pixels=1296,
+                               buffer_size=10) as writer:
+            for event_id, image in zip(event_ids, images):
+                writer.append(event_id, image)
+        loaded = SparseImages(filename)
+        assert len(loaded) == len(images)
+        assert len(loaded.value) == np.count_nonzero(images)
+        np.testing.assert_array_equal(loaded.event_id, event_ids)
+        np.testing.assert_array_equal(loaded.dense(), images)
+        rows = [200, 10, 3]
+        np.testing.assert_array_equal(loaded.dense(rows), images[rows])
+
+
+def test_load_sparse_rows():
+    images = np.random.uniform(size=(50, 1296)).astype(np.float32)
+    images[images < 0.9] = 0
+    event_ids = np.arange(len(images)) + 100
+    dense_rows = np.column_stack((event_ids, images))
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        filename = os.path.join(tmpdirname, 'images.h5')
+        pixels_filename = os.path.join(tmpdirname, 'pixels.npy')
+        np.save(pixels_filename, np.zeros((2, 1296)))
+        with SparseImageWriter(filename, n_pixels=1296) as writer:
+            for event_id, image in zip(event_ids, images):
+                writer.append(event_id, image)
+        _, rows = load_image(pixels_filename, filename)
+        assert rows.shape == dense_rows.shape
+        mask = np.random.uniform(size=len(images)) > 0.5
+        np.testing.assert_array_equal(rows[mask, 1:], dense_rows[mask, 1:])
+        np.testing.assert_array_equal(rows[3], dense_rows[3])
+        np.testing.assert_array_equal(rows[5:9, 0], dense_rows[5:9, 0])
@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+import astropy.units as u
+import numpy as np
+import pytest
+from astropy.table import Table
+
+from digicampipe.io.table_writer import TableWriter
+
+
+@pytest.mark.parametrize('extension', ['.fits', '.h5'])
+def test_table_writer(extension):
+    n_rows = 25
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        filename = os.path.join(tmpdirname, 'table' + extension)
+        with TableWriter(filename, buffer_size=10) as writer:
+            for i in range(n_rows):
+                writer.append({
+                    'event_id': i,
+                    'length': i * u.mm,
+                    'burst': i % 2 == 0,
+                })
+        with TableWriter(filename, mode='a', buffer_size=10) as writer:
+            writer.append({'event_id': n_rows, 'length': 1 * u.cm,
+                           'burst': False})
+        if extension == '.h5':
+            table = Table.read(filename, path='events')
+        else:
+            table = Table.read(filename)
+        assert len(table) == n_rows + 1
+        np.testing.assert_array_equal(table['event_id'], np.arange(n_rows + 1))
+        assert table['length'][-1] == 10
+        assert table['burst'].dtype == bool
+        assert np.all(table['burst'][:n_rows] == (np.arange(n_rows) % 2 == 0))
+
+
+def test_table_writer_no_rows():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        filename = os.path.join(tmpdirname, 'table.fits')
+        with TableWriter(filename) as writer:
+            writer.append({'event_id': 1})
+        assert os.path.isfile(filename)
+        # the table of a previous run is not kept if no row is written
+        with TableWriter(filename) as writer:
+            pass
+        assert writer.n_rows == 0
+        assert not os.path.isfile(filename)
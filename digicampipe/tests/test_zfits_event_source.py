@@ -1,10 +1,16 @@
 import os
+import pickle
+import shutil
+import tempfile
 
+import numpy as np
 import pkg_resources
 
 from digicampipe.io.event_stream import event_stream
 from digicampipe.io.zfits import count_number_events
-from digicampipe.io.zfits import zfits_event_source
+from digicampipe.io.index import get_index_path
+from digicampipe.io.zfits import zfits_event_source, zfits_batch_source, \
+    get_event_index, read_headers, split_rows, map_shards
 
 example_file_path = pkg_resources.resource_filename(
     'digicampipe',
@@ -57,5 +63,233 @@ def test_event_id():
     assert number == event_id
 
 
+def test_batch_source():
+    tel_id = 1
+    event_numbers = []
+    local_times = []
+    adc_samples = []
+    baselines = []
+    for data in zfits_event_source(example_file_path):
+        r0 = data.r0.tel[tel_id]
+        event_numbers.append(r0.camera_event_number)
+        local_times.append(r0.local_camera_clock)
+        adc_samples.append(r0.adc_samples)
+        baselines.append(r0.digicam_baseline)
+
+    batch_size = 30
+    n_events = 0
+    for batch in zfits_batch_source(example_file_path, batch_size=batch_size):
+        n_batch = len(batch.event_id)
+        assert n_batch <= batch_size
+        assert batch.adc_samples.shape[0] == n_batch
+        np.testing.assert_array_equal(
+            batch.camera_event_number,
+            event_numbers[n_events:n_events + n_batch]
+        )
+        np.testing.assert_array_equal(
+            batch.local_camera_clock,
+            local_times[n_events:n_events + n_batch]
+        )
+        np.testing.assert_array_equal(
+            batch.adc_samples,
+            adc_samples[n_events:n_events + n_batch]
+        )
+        np.testing.assert_array_equal(
+            batch.digicam_baseline,
+            baselines[n_events:n_events + n_batch]
+        )
+        n_events += n_batch
+
+    assert n_events == EVENTS_IN_EXAMPLE_FILE
+
+
+def test_ring_size():
+    tel_id = 1
+    ring_size = 5
+    expected = [
+        data.r0.tel[tel_id].adc_samples
+        for data in zfits_event_source(example_file_path)
+    ]
+    last_adc_samples = []
+    for i, data in enumerate(zfits_event_source(example_file_path,
+                                                ring_size=ring_size)):
+        last_adc_samples.append(data.r0.tel[tel_id].adc_samples)
+        last_adc_samples = last_adc_samples[-ring_size:]
+        # the last ring_size events stay valid while the next are read
+        for j, adc_samples in enumerate(last_adc_samples):
+            event = i + 1 - len(last_adc_samples) + j
+            np.testing.assert_array_equal(adc_samples, expected[event])
+    assert i == EVENTS_IN_EXAMPLE_FILE - 1
+    assert len(last_adc_samples) == ring_size
+
+
+def test_lazy_trigger_traces():
+    tel_id = 1
+    for data in zfits_event_source(example_file_path, max_events=3):
+        r0 = data.r0.tel[tel_id]
+        n_samples = data.inst.num_samples[tel_id]
+        assert r0.trigger_input_traces.shape == (432, n_samples)
+        assert r0.trigger_output_patch7.shape == (432, n_samples)
+        assert r0.trigger_output_patch19.shape == (432, n_samples)
+        # once decoded, the same array is returned
+        assert r0.trigger_output_patch7 is r0.trigger_output_patch7
+
+
+def test_serialize_lazy_trigger_traces():
+    tel_id = 1
+    trigger_fields = ['trigger_input_traces', 'trigger_output_patch7',
+                      'trigger_output_patch19']
+    for data in zfits_event_source(example_file_path, max_events=3):
+        # the trigger traces have not been accessed yet
+        r0_dict = data.r0.tel[tel_id].as_dict()
+        for field in trigger_fields:
+            assert isinstance(r0_dict[field], np.ndarray)
+        r0 = pickle.loads(pickle.dumps(data.r0.tel[tel_id]))
+        for field in trigger_fields:
+            np.testing.assert_array_equal(r0[field], r0_dict[field])
+
+
+def test_read_headers():
+    tel_id = 1
+    headers = read_headers([example_file_path] * 2, baseline=True)
+    assert len(headers['event_number']) == 2 * EVENTS_IN_EXAMPLE_FILE
+    for row, data in enumerate(zfits_event_source(example_file_path)):
+        r0 = data.r0.tel[tel_id]
+        assert headers['event_number'][row] == r0.camera_event_number
+        assert headers['local_camera_clock'][row] == r0.local_camera_clock
+        assert headers['gps_time'][row] == r0.gps_time
+        assert headers['camera_event_type'][row] == r0.camera_event_type
+        assert headers['array_event_type'][row] == r0.array_event_type
+        assert np.isclose(headers['baseline_mean'][row],
+                          np.mean(r0.digicam_baseline))
+    headers = read_headers(example_file_path, max_events=10)
+    assert len(headers['event_number']) == 10
+
+
+def test_read_headers_ranges():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        file = os.path.join(tmpdirname, 'example.fits.fz')
+        shutil.copy(example_file_path, file)
+        event_id_range = (FIRST_EVENT_ID + 10, FIRST_EVENT_ID + 20)
+        headers = read_headers([file] * 2, event_id_range=event_id_range,
+                               baseline=True)
+        expected = list(range(FIRST_EVENT_ID + 11, FIRST_EVENT_ID + 21))
+        assert list(headers['event_number']) == expected * 2
+        assert np.all(headers['baseline_mean'] > 0)
+        clock = headers['local_camera_clock']
+        time_range = (clock[2], clock[5])
+        headers = read_headers(file, time_range=time_range)
+        assert list(headers['local_camera_clock']) == list(clock[2:5])
+        headers = read_headers(file, event_id_range=(LAST_EVENT_ID, None))
+        assert len(headers['event_number']) == 0
+
+
+def _shard_event_numbers(url, row_range):
+    return [
+        data.r0.tel[1].camera_event_number
+        for data in zfits_event_source(url, row_range=row_range)
+    ]
+
+
+def test_shards():
+    shards = split_rows(example_file_path, n_shards=3)
+    assert len(shards) == 3
+    assert shards[0][0] == 0
+    assert shards[-1][1] == EVENTS_IN_EXAMPLE_FILE
+    event_numbers = []
+    for row_range in shards:
+        event_numbers += _shard_event_numbers(example_file_path, row_range)
+    expected = list(range(FIRST_EVENT_ID, LAST_EVENT_ID + 1))
+    assert event_numbers == expected
+    event_numbers = map_shards(_shard_event_numbers, example_file_path,
+                               n_shards=4, n_workers=2,
+                               merge=lambda a, b: a + b)
+    assert event_numbers == expected
+
+
+def test_shards_event_id():
+    tel_id = 1
+    expected = []
+    for batch in zfits_batch_source(example_file_path, batch_size=10,
+                                    row_range=(20, 70)):
+        expected += list(zip(batch.event_id, batch.camera_event_number))
+    shards = [(20, 45), (45, 70)]
+    event_ids = []
+    for row_range in shards:
+        event_ids += [
+            (data.r0.event_id, data.r0.tel[tel_id].camera_event_number)
+            for data in zfits_event_source(example_file_path,
+                                           row_range=row_range)
+        ]
+    assert event_ids == expected
+    assert event_ids[0][0] == 20
+
+
+def test_event_index():
+    tel_id = 1
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        file = os.path.join(tmpdirname, 'example.fits.fz')
+        shutil.copy(example_file_path, file)
+        index = get_event_index(file)
+        assert os.path.isfile(get_index_path(file))
+        assert len(index['event_number']) == EVENTS_IN_EXAMPLE_FILE
+        assert index['event_number'][0] == FIRST_EVENT_ID
+        assert index['event_number'][-1] == LAST_EVENT_ID
+
+        for row, data in enumerate(zfits_event_source(file)):
+            r0 = data.r0.tel[tel_id]
+            assert index['event_number'][row] == r0.camera_event_number
+            assert index['local_camera_clock'][row] == r0.local_camera_clock
+            assert index['gps_time'][row] == r0.gps_time
+
+        event_id_range = (FIRST_EVENT_ID + 10, FIRST_EVENT_ID + 20)
+        numbers = [
+            data.r0.tel[tel_id].camera_event_number
+            for data in zfits_event_source(file, event_id_range=event_id_range)
+        ]
+        assert numbers == list(range(FIRST_EVENT_ID + 11, FIRST_EVENT_ID + 21))
+
+        time_range = (index['local_camera_clock'][5],
+                      index['local_camera_clock'][8])
+        numbers = [
+            data.r0.tel[tel_id].camera_event_number
+            for data in event_stream(file, time_range=time_range)
+        ]
+        clock = index['local_camera_clock']
+        in_range = (clock >= time_range[0]) & (clock < time_range[1])
+        assert numbers == list(index['event_number'][in_range])
+
+
+
+def test_max_events_with_ranges(monkeypatch):
+    """
+    Only the events in the ranges count toward max_events, even when the
+    selected rows are not contiguous.
+    """
+    tel_id = 1
+    max_events = 3
+
+    def select_even_rows(index, event_id_range, time_range):
+        selected_rows = np.zeros(len(index['event_number']), dtype=bool)
+        selected_rows[::2] = True
+        return selected_rows
+
+    monkeypatch.setattr('digicampipe.io.zfits.select_rows', select_even_rows)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        file = os.path.join(tmpdirname, 'example.fits.fz')
+        shutil.copy(example_file_path, file)
+        n_events = len(list(zfits_event_source(file, max_events=max_events)))
+        numbers = [
+            data.r0.tel[tel_id].camera_event_number
+            for data in zfits_event_source(
+                file, max_events=max_events,
+                event_id_range=(FIRST_EVENT_ID, None)
+            )
+        ]
+    assert len(numbers) == n_events
+    assert numbers == list(range(FIRST_EVENT_ID, LAST_EVENT_ID + 1, 2))[
+        :n_events]
+
+
 if __name__ == '__main__':
     test_event_id()
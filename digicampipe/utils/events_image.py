@@ -1,8 +1,17 @@
 # Functions for extracting and saving cleaned events
+# The images and timings are written while streaming the events. If the
+# output file name ends with .npy, they are written in binary and can be
+# read back through memory mapping. If the images file name ends with .h5
+# or .hdf5, only the pixels surviving the cleaning are stored (c.f.
+# digicampipe.io.sparse_image) and load_image() decodes only the images
+# which are indexed. Otherwise they are written as text.
 
 import numpy as np
 from ctapipe.instrument import CameraGeometry
 
+from digicampipe.io.npy_writer import NpyWriter
+from digicampipe.io.sparse_image import SparseImageWriter, SparseImages
+
 
 def make_image(geom: CameraGeometry, image):
     pix_x = np.asanyarray(geom.pix_x, dtype=np.float64).value
@@ -21,50 +30,152 @@ def save_image(pix_x, pix_y, image, filename_pix, filename_eventsimage):
 
 
 def load_image(pixels_file, events_file):
-    pixels = np.loadtxt(pixels_file)
-    events = np.loadtxt(events_file)
+    pixels = _load_array(pixels_file)
+    events = _load_array(events_file)
 
     return pixels, events
 
 
-def save_events(event_stream, filename_pix, filename_eventsimage):
-    image_all = []
-
-    for i, event in enumerate(event_stream):
-        for telescope_id in event.r0.tels_with_data:
-            if i == 0:
-                geom = event.inst.geom[telescope_id]
-            dl1_camera = event.dl1.tel[telescope_id]
-            image = dl1_camera.pe_samples
-            mask = dl1_camera.cleaning_mask
-            image[~mask] = 0.
-
-        # saving cleaned event images
-        pix_x, pix_y, image = make_image(geom, image)
-        event_number = event.r0.event_id
-        image = np.hstack((event_number, image))  # [event_number,image_values]
-        image_all.append(image)
-        print('saving event', i)
-
-        yield event
-
-    # save cleaned images for all events
-    save_image(pix_x, pix_y, image_all, filename_pix, filename_eventsimage)
+def _is_sparse(filename):
+    return filename.endswith(('.h5', '.hdf5'))
+
+
+def _load_array(filename):
+    if _is_sparse(filename):
+        return _SparseRows(filename)
+    if filename.endswith('.npy'):
+        return np.load(filename, mmap_mode='r')
+    return np.loadtxt(filename)
+
+
+class _SparseRows:
+    """Rows [event_number, image_values] of a zero-suppressed file, with
+    the same indexing as the dense array. Only the indexed rows are decoded,
+    so f.e. images[mask, 1:] does not expand the images outside of mask."""
+
+    def __init__(self, filename):
+        self.images = SparseImages(filename)
+        self.shape = (len(self.images), self.images.n_pixels + 1)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, item):
+        if not isinstance(item, tuple):
+            item = (item, )
+        rows = item[0]
+        if not isinstance(rows, slice):
+            rows = np.asarray(rows)
+        rows = np.arange(len(self))[rows]
+        selected = np.column_stack((
+            self.images.event_id[np.atleast_1d(rows)],
+            self.images.dense(np.atleast_1d(rows))
+        ))
+        if np.ndim(rows) == 0:
+            selected = selected[0]
+        return selected[(Ellipsis, ) + item[1:]]
+
+
+class _TextWriter:
+    """Same interface as NpyWriter, writing each row as a line of text"""
+
+    def __init__(self, filename, fmt):
+        self.file = open(filename, 'w')
+        self.fmt = fmt
+
+    def append(self, row):
+        np.savetxt(self.file, np.reshape(row, (1, -1)), self.fmt)
+
+    def close(self):
+        self.file.close()
+
+
+class _SparseRowWriter:
+    """Same interface as NpyWriter, for rows [event_number, image_values]
+    written to a SparseImageWriter"""
+
+    def __init__(self, filename, n_pixels, dtype=np.float32):
+        self.writer = SparseImageWriter(filename, n_pixels, dtype=dtype)
+
+    def append(self, row):
+        self.writer.append(row[0], row[1:])
+
+    def close(self):
+        self.writer.close()
+
+
+def _get_writer(filename, row_size, fmt):
+    if filename.endswith('.npy'):
+        return NpyWriter(filename, row_shape=(row_size, ))
+    return _TextWriter(filename, fmt)
+
+
+def save_events(event_stream, filename_pix, filename_eventsimage,
+                sparse_dtype=np.float32):
+    """
+    Save the cleaned images of the events while streaming them.
+    :param event_stream: stream of events with the dl1 images and cleaning
+    masks
+    :param filename_pix: file where the pixel positions are saved
+    :param filename_eventsimage: file where the images are saved, one row
+    [event_number, image_values] per event. If it ends with .h5 or .hdf5,
+    only the pixels surviving the cleaning are stored.
+    :param sparse_dtype: data type of the pixel values stored in .h5 or
+    .hdf5 files, f.e. np.float16 to reduce further the size of the file.
+    """
+    writer = None
+    try:
+        for i, event in enumerate(event_stream):
+            for telescope_id in event.r0.tels_with_data:
+                if i == 0:
+                    geom = event.inst.geom[telescope_id]
+                dl1_camera = event.dl1.tel[telescope_id]
+                image = dl1_camera.pe_samples
+                mask = dl1_camera.cleaning_mask
+                image[~mask] = 0.
+
+            # saving cleaned event images
+            pix_x, pix_y, image = make_image(geom, image)
+            if writer is None:
+                if filename_pix.endswith('.npy'):
+                    np.save(filename_pix, np.vstack((pix_x, pix_y)))
+                else:
+                    np.savetxt(filename_pix, np.vstack((pix_x, pix_y)),
+                               '%1.4f')
+                if _is_sparse(filename_eventsimage):
+                    writer = _SparseRowWriter(filename_eventsimage,
+                                              len(image), sparse_dtype)
+                else:
+                    writer = _get_writer(filename_eventsimage,
+                                         len(image) + 1, '%1.5f')
+            event_number = event.r0.event_id
+            # [event_number,image_values]
+            writer.append(np.hstack((event_number, image)))
+            print('saving event', i)
+
+            yield event
+    finally:
+        if writer is not None:
+            writer.close()
 
 
 def save_timing(event_stream, filename_timing):
-    timing_all = []
-
-    for i, event in enumerate(event_stream):
-
-        for telescope_id in event.r0.tels_with_data:
-            dl1_camera = event.dl1.tel[telescope_id]
-            mask = dl1_camera.cleaning_mask
-            timing_data = dl1_camera.time_bin[1]
-            timing_data[~mask] = 0.
-
-        timing_all.append(timing_data)
-
-        yield event
-
-    np.savetxt(filename_timing, timing_all, '%1.5f')
+    writer = None
+    try:
+        for i, event in enumerate(event_stream):
+
+            for telescope_id in event.r0.tels_with_data:
+                dl1_camera = event.dl1.tel[telescope_id]
+                mask = dl1_camera.cleaning_mask
+                timing_data = dl1_camera.time_bin[1]
+                timing_data[~mask] = 0.
+
+            if writer is None:
+                writer = _get_writer(filename_timing, len(timing_data),
+                                     '%1.5f')
+            writer.append(timing_data)
+
+            yield event
+    finally:
+        if writer is not None:
+            writer.close()
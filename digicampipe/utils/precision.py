@@ -0,0 +1,69 @@
+"""
+Floating point precision of the calibrated quantities.
+The waveforms are converted from ADC counts to floats when the baseline is
+subtracted, and all the quantities computed from them (charges, number of
+p.e., sample p.e., ...) keep that precision. float64 is used by default.
+float32 halves the memory used by the (n_pixels, n_samples) arrays, with
+results within FLOAT32_RTOL and FLOAT32_ATOL of the float64 ones; it is used
+by digicam-pipeline unless its --precision option says otherwise.
+The precision can be changed with set_float_dtype() or with the
+environment variable DIGICAMPIPE_FLOAT_PRECISION ("float32" or "float64").
+The calibration functions read the precision when they start processing
+events, so it must be set before iterating over the event stream.
+"""
+import os
+
+import numpy as np
+
+__all__ = ['get_float_dtype', 'set_float_dtype', 'as_float',
+           'FLOAT32_RTOL', 'FLOAT32_ATOL']
+
+FLOAT_DTYPES = {
+    'float32': np.float32,
+    'float64': np.float64,
+}
+# tolerance (relative, and absolute in LSB or p.e.) expected between the
+# results of the calibration computed in float32 and in float64
+FLOAT32_RTOL = 1e-5
+FLOAT32_ATOL = 1e-3
+
+_float_dtype = None
+
+
+def set_float_dtype(precision):
+    """
+    Set the floating point type used for the calibrated quantities.
+    :param precision: "float32", "float64" or the corresponding numpy type
+    """
+    global _float_dtype
+    if precision in FLOAT_DTYPES.values():
+        _float_dtype = precision
+        return
+    if precision not in FLOAT_DTYPES.keys():
+        raise ValueError('precision must be one of {}, not {}'.format(
+            sorted(FLOAT_DTYPES.keys()), precision))
+    _float_dtype = FLOAT_DTYPES[precision]
+
+
+def get_float_dtype():
+    """
+    :return: the floating point type used for the calibrated quantities,
+    np.float32 or np.float64
+    """
+    return _float_dtype
+
+
+def as_float(array):
+    """
+    Convert an array (or a Quantity) to the floating point type of the
+    calibrated quantities. No copy is made if it is already of that type.
+    :param array: array_like
+    :return: array of type get_float_dtype()
+    """
+    dtype = get_float_dtype()
+    if hasattr(array, 'astype') and not np.isscalar(array):
+        return array.astype(dtype, copy=False)
+    return np.asarray(array, dtype=dtype)
+
+
+set_float_dtype(os.environ.get('DIGICAMPIPE_FLOAT_PRECISION', 'float64'))
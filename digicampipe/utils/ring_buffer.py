@@ -0,0 +1,170 @@
+"""
+Fixed size buffer keeping the last items of a stream of arrays.
+The memory is allocated once, so looking back at the last events does not
+require to copy them into python lists.
+RollingStatistics adds the mean and standard deviation over the buffer,
+updated with each new item instead of being computed over the whole buffer.
+"""
+import numpy as np
+
+__all__ = ['RingBuffer', 'RollingStatistics']
+
+
+class RingBuffer:
+    """
+    Buffer of the last n_items arrays of a given shape.
+    New items overwrite the oldest ones once the buffer is full.
+    """
+
+    def __init__(self, n_items, shape=(), dtype=np.float64):
+        """
+        :param n_items: maximum number of items kept in the buffer
+        :param shape: shape of each item
+        :param dtype: data type of the items
+        """
+        if n_items < 1:
+            raise ValueError('n_items must be at least 1')
+        self.data = np.zeros((n_items, ) + tuple(shape), dtype=dtype)
+        self.n_items = n_items
+        self.n_filled = 0
+        self.index = 0  # slot where the next item is written
+
+    def __len__(self):
+        return self.n_filled
+
+    def is_full(self):
+        return self.n_filled == self.n_items
+
+    def clear(self):
+        self.n_filled = 0
+        self.index = 0
+
+    def next_slot(self):
+        """
+        Get the slot of the next item, such that it can be filled in place.
+        The slot is counted as filled.
+        :return: view on the slot, of the shape of an item
+        """
+        slot = self.data[self.index]
+        self.index = (self.index + 1) % self.n_items
+        self.n_filled = min(self.n_filled + 1, self.n_items)
+        return slot
+
+    def append(self, item):
+        """
+        Copy item in the buffer, replacing the oldest one if it is full.
+        :param item: array of the shape of an item
+        :return: view on the slot where item was copied
+        """
+        index = self.index
+        self.data[index] = item
+        self.next_slot()
+        return self.data[index]
+
+    def values(self):
+        """
+        :return: view on the filled slots. Once the buffer is full,
+        the items are not in chronological order (use last() for that).
+        """
+        return self.data[:self.n_filled]
+
+    def last(self, n=None):
+        """
+        :param n: number of items to return. If None, all the items in the
+        buffer are returned.
+        :return: array of the last n items, from the oldest to the newest.
+        It is a view if the items are contiguous in the buffer, a copy
+        otherwise.
+        """
+        if n is None or n > self.n_filled:
+            n = self.n_filled
+        start = self.index - n
+        if start >= 0:
+            return self.data[start:self.index]
+        if self.index == 0:
+            return self.data[start:]
+        return np.concatenate((self.data[start:], self.data[:self.index]))
+
+    def mean(self):
+        """
+        :return: the mean over the items in the buffer.
+        """
+        return np.mean(self.values(), axis=0)
+
+
+class RollingStatistics:
+    """
+    Mean and standard deviation over the last n_items arrays of a given
+    shape. Each append() updates them in O(size of an item) with Welford's
+    algorithm, adding the new item and removing the oldest one. To avoid
+    the accumulation of rounding errors, they are computed again from the
+    buffer each time it has been entirely replaced.
+    """
+
+    def __init__(self, n_items, shape=()):
+        """
+        :param n_items: number of items over which the statistics are
+        computed
+        :param shape: shape of each item
+        """
+        self.items = RingBuffer(n_items, shape=shape, dtype=np.float64)
+        self._mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)  # sum of squared differences to the mean
+
+    def __len__(self):
+        return len(self.items)
+
+    def is_full(self):
+        return self.items.is_full()
+
+    def clear(self):
+        self.items.clear()
+        self._mean[...] = 0
+        self._m2[...] = 0
+
+    def append(self, item):
+        """
+        Add item to the statistics, replacing the oldest one if the buffer
+        is full.
+        :param item: array of the shape of an item
+        """
+        item = np.asarray(item, dtype=np.float64)
+        if not self.items.is_full():
+            self.items.append(item)
+            delta = item - self._mean
+            self._mean += delta / len(self.items)
+            self._m2 += delta * (item - self._mean)
+            return
+        oldest = np.copy(self.items.data[self.items.index])
+        self.items.append(item)
+        if self.items.index == 0:
+            self._update_from_buffer()
+            return
+        delta = item - oldest
+        previous_mean = np.copy(self._mean)
+        self._mean += delta / self.items.n_items
+        self._m2 += delta * (item - self._mean + oldest - previous_mean)
+
+    def _update_from_buffer(self):
+        values = self.items.values()
+        self._mean[...] = np.mean(values, axis=0)
+        self._m2[...] = np.sum((values - self._mean) ** 2, axis=0)
+
+    def mean(self):
+        """
+        :return: the mean over the items in the buffer (a copy).
+        """
+        if len(self.items) == 0:
+            return np.full_like(self._mean, np.nan)[()]
+        return np.copy(self._mean)[()]
+
+    def std(self, ddof=0):
+        """
+        :param ddof: delta degrees of freedom, as in np.std()
+        :return: the standard deviation over the items in the buffer.
+        """
+        n_filled = len(self.items)
+        if n_filled - ddof <= 0:
+            return np.full_like(self._m2, np.nan)[()]
+        variance = np.maximum(self._m2 / (n_filled - ddof), 0)
+        return np.sqrt(variance)[()]
@@ -50,6 +50,7 @@ setup(
         'scipy',
         'astropy',
         'h5py',
+        'fitsio',
         'tqdm',
         'docopt',
         'pyyaml',